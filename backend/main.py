@@ -1,19 +1,33 @@
 import os
+import asyncio
 import logging
 import uuid
 import time
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
-from pipeline.dubbing import DubbingPipeline
 from pipeline.base import PipelineError
+from worker import (
+    pipeline, session_store, process_video_background, process_video_task,
+    result_cache, try_reserve_job_slot, release_job_slot
+)
 
 # Load environment variables
 load_dotenv()
 
+# Prefer uvloop's C event loop when installed - every subprocess spawn and
+# stream read in the pipeline gets faster with no code changes. DUB_LOOP=default
+# opts back into the stdlib loop for debugging.
+if os.getenv("DUB_LOOP", "uvloop") == "uvloop":
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass  # optional dependency - stdlib asyncio works fine, just slower
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -22,17 +36,28 @@ logger = logging.getLogger(__name__)
 app = FastAPI(
     title="DubADubDub API",
     description="Automatic video dubbing service using ElevenLabs and Claude AI",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse  # orjson serializes responses several times faster than stdlib json
 )
 
-# Initialize pipeline
-pipeline = DubbingPipeline()
 
-# Store active sessions - in production, use Redis or database
-active_sessions: Dict[str, Dict[str, Any]] = {}
+
+class LargeFileResponse(FileResponse):
+    """FileResponse tuned for multi-hundred-MB video files.
+
+    Starlette's default 64KB chunk size means thousands of read/send round
+    trips through the thread pool for a single MP4; 1MB chunks cut that ~16x.
+    When the ASGI server advertises the http.response.pathsend extension,
+    Starlette hands the whole file to the server for a zero-copy send instead.
+    """
+    chunk_size = 1024 * 1024
 
 
 class VideoRequest(BaseModel):
+    # frozen skips per-instance mutability bookkeeping; extra='forbid' rejects
+    # typo'd fields at the edge instead of silently dropping them
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     youtube_url: str
     target_language: str = "spanish"
     video_quality: Optional[str] = "best"
@@ -44,12 +69,16 @@ class VideoRequest(BaseModel):
 
 
 class VideoResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     session_id: str
     status: str
     results: Optional[Dict[str, Any]] = None
 
 
 class StatusResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     session_id: str
     status: str
     current_stage: Optional[str] = None
@@ -60,15 +89,24 @@ class StatusResponse(BaseModel):
     duration: Optional[float] = None
 
 
+# Resolved once at import - no per-request path building or stat calls
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
+INDEX_PATH = os.path.join(FRONTEND_DIR, "index.html")
+FRONTEND_AVAILABLE = os.path.exists(INDEX_PATH)
+
+# In production, front the app with Nginx/a CDN and set SERVE_FRONTEND=0 so
+# static assets never touch the Python event loop; the in-process serving
+# below is a dev convenience
+SERVE_FRONTEND = os.getenv("SERVE_FRONTEND", "1") != "0"
+
+
 @app.get("/")
 async def serve_frontend():
     """Serve the frontend HTML file"""
-    frontend_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
-    index_path = os.path.join(frontend_dir, "index.html")
-    if os.path.exists(index_path):
-        return FileResponse(index_path)
+    if SERVE_FRONTEND and FRONTEND_AVAILABLE:
+        return FileResponse(INDEX_PATH)
     else:
-        return {"message": "DubADubDub API is running", "version": "1.0.0", "frontend": "not found"}
+        return {"message": "DubADubDub API is running", "version": "1.0.0", "frontend": "not served here"}
 
 
 @app.get("/api")
@@ -81,125 +119,72 @@ async def health_check():
     return {"status": "healthy", "service": "DubADubDub"}
 
 
-async def process_video_background(session_id: str, youtube_url: str, target_language: str, video_duration: str = "full"):
-    """Background task to process video with stage-by-stage status updates"""
-    try:
-        logger.info(f"Background processing started for session {session_id}")
-        results = {}
-        
-        # Stage 1: Download
-        active_sessions[session_id].update({
-            "status": "processing",
-            "current_stage": "download",
-            "progress": 15
-        })
-        
-        logger.info(f"Session {session_id}: Starting download stage")
-        download_result = await pipeline.download_stage.process(youtube_url, video_duration, session_id)
-        results['download'] = download_result
-        
-        # Stage 2: Transcribe
-        active_sessions[session_id].update({
-            "current_stage": "transcribe", 
-            "progress": 35
-        })
-        
-        logger.info(f"Session {session_id}: Starting transcribe stage")
-        transcribe_result = await pipeline.transcribe_stage.process(download_result['audio_path'])
-        results['transcribe'] = transcribe_result
-        
-        # Stage 3: Translate
-        active_sessions[session_id].update({
-            "current_stage": "translate",
-            "progress": 55,
-            "source_language": transcribe_result.get('detected_language', 'unknown')
-        })
-        
-        logger.info(f"Session {session_id}: Starting translate stage")
-        translate_result = await pipeline.translate_stage.process(transcribe_result, target_language)
-        results['translate'] = translate_result
-        
-        # Stage 4: Synthesize
-        active_sessions[session_id].update({
-            "current_stage": "synthesize",
-            "progress": 75
-        })
-        
-        logger.info(f"Session {session_id}: Starting synthesize stage")
-        synthesize_result = await pipeline.synthesize_stage.process(translate_result, download_result)
-        results['synthesize'] = synthesize_result
-        
-        # Stage 5: Overlay
-        active_sessions[session_id].update({
-            "current_stage": "overlay",
-            "progress": 90
-        })
-        
-        logger.info(f"Session {session_id}: Starting overlay stage")
-        assembly_data = {
-            'video_path': download_result['video_path'],
-            'dubbed_audio_path': synthesize_result['synthesized_audio_path'],
-            'session_id': session_id
-        }
-        overlay_result = await pipeline.overlay_stage.process(assembly_data)
-        results['overlay'] = overlay_result
-        
-        # Final completion
-        active_sessions[session_id].update({
-            "status": "completed",
-            "current_stage": "completed",
-            "progress": 100,
-            "results": results,
-            "source_language": transcribe_result.get('detected_language', 'unknown'),
-            "target_language": target_language,
-            "duration": download_result.get('duration')
-        })
-        
-        logger.info(f"Background processing completed for session {session_id}")
-        
-    except PipelineError as e:
-        logger.error(f"Pipeline error in background task: {str(e)}")
-        active_sessions[session_id].update({
-            "status": "error",
-            "error": f"{e.stage}: {e.message}",
-            "retry_possible": e.retry_possible
-        })
-    except Exception as e:
-        logger.error(f"Unexpected error in background task: {str(e)}")
-        active_sessions[session_id].update({
-            "status": "error",
-            "error": str(e),
-            "retry_possible": True
-        })
-
-
 @app.post("/process-video", response_model=VideoResponse)
 async def process_video(request: VideoRequest, background_tasks: BackgroundTasks):
     """Start processing a YouTube video through the complete dubbing pipeline"""
+    slot_reserved = False
     try:
+        # Reuse a completed session for an identical (url, language, duration)
+        # request instead of re-running the whole pipeline
+        cached_session_id = result_cache.get(request.youtube_url, request.target_language, request.video_duration)
+        if cached_session_id:
+            cached = await session_store.get(cached_session_id)
+            if cached and cached.get("status") == "completed":
+                logger.info(f"Cache hit for {request.youtube_url} -> {request.target_language}, reusing session {cached_session_id}")
+                return VideoResponse(
+                    session_id=cached_session_id,
+                    status="completed",
+                    results=cached.get("results")
+                )
+
+        # Shed load before accepting work the box can't hold in memory -
+        # Celery has its own worker-side limits, so this applies to the
+        # in-process BackgroundTasks fallback. The slot is claimed here,
+        # before the response goes out, so concurrent requests can't all
+        # observe spare capacity and overshoot the queue cap.
+        if process_video_task is None:
+            if not try_reserve_job_slot():
+                raise HTTPException(
+                    status_code=503,
+                    detail="Server is at capacity, please retry shortly"
+                )
+            slot_reserved = True
+
         # Generate session ID
         session_id = str(uuid.uuid4())
-        
+
         logger.info(f"Starting video processing for session {session_id}: {request.youtube_url} -> {request.target_language}")
         
         # Initialize session
-        active_sessions[session_id] = {
+        await session_store.set(session_id, {
             "session_id": session_id,
             "youtube_url": request.youtube_url,
             "target_language": request.target_language,
             "status": "queued",
             "created_at": time.time(),
             "progress": 0
-        }
+        })
         
-        # Start background processing
-        background_tasks.add_task(
-            process_video_background, 
-            session_id, 
-            request.youtube_url, 
-            request.target_language,
-            request.video_duration
-        )
+        # Start background processing - prefer the Celery worker pool when a
+        # broker is configured so jobs don't compete with HTTP handlers and
+        # survive uvicorn reloads
+        if process_video_task is not None:
+            process_video_task.delay(
+                session_id,
+                request.youtube_url,
+                request.target_language,
+                request.video_duration
+            )
+        else:
+            background_tasks.add_task(
+                process_video_background,
+                session_id,
+                request.youtube_url,
+                request.target_language,
+                request.video_duration
+            )
+            # The task's finally releases the slot from here on
+            slot_reserved = False
         
         response = VideoResponse(
             session_id=session_id,
@@ -207,8 +192,12 @@ async def process_video(request: VideoRequest, background_tasks: BackgroundTasks
         )
         
         return response
-        
+
+    except HTTPException:
+        raise
     except Exception as e:
+        if slot_reserved:
+            release_job_slot()
         logger.error(f"Error starting video processing: {str(e)}")
         raise HTTPException(
             status_code=500,
@@ -219,14 +208,13 @@ async def process_video(request: VideoRequest, background_tasks: BackgroundTasks
 @app.get("/status/{session_id}", response_model=StatusResponse)
 async def get_status(session_id: str):
     """Get the processing status of a video dubbing session"""
-    if session_id not in active_sessions:
+    session = await session_store.get(session_id)
+    if session is None:
         raise HTTPException(
             status_code=404,
             detail=f"Session {session_id} not found"
         )
     
-    session = active_sessions[session_id]
-    
     return StatusResponse(
         session_id=session_id,
         status=session.get("status", "unknown"),
@@ -242,14 +230,13 @@ async def get_status(session_id: str):
 @app.get("/download/{session_id}")
 async def download_video(session_id: str):
     """Download the processed video file"""
-    if session_id not in active_sessions:
+    session = await session_store.get(session_id)
+    if session is None:
         raise HTTPException(
             status_code=404,
             detail=f"Session {session_id} not found"
         )
     
-    session = active_sessions[session_id]
-    
     if session.get("status") != "completed":
         raise HTTPException(
             status_code=400,
@@ -261,7 +248,8 @@ async def download_video(session_id: str):
     overlay_result = results.get("overlay", {})
     final_video_path = overlay_result.get("final_video_path")
     
-    if not final_video_path or not os.path.exists(final_video_path):
+    # Stat the file off the event loop - session dirs can sit on slow storage
+    if not final_video_path or not await asyncio.to_thread(os.path.exists, final_video_path):
         raise HTTPException(
             status_code=404,
             detail="Processed video file not found"
@@ -269,91 +257,91 @@ async def download_video(session_id: str):
     
     # Return the file
     filename = f"dubbed_video_{session_id}.mp4"
-    return FileResponse(
+    return LargeFileResponse(
         path=final_video_path,
         filename=filename,
         media_type="video/mp4"
     )
 
 
-# Test endpoints for development
-@app.post("/test-download")
-async def test_download(request: Dict[str, str]):
-    """Test endpoint for download functionality"""
-    try:
-        youtube_url = request.get("youtube_url")
-        if not youtube_url:
-            raise HTTPException(status_code=400, detail="youtube_url required")
-        
-        result = await pipeline.download_stage.process(youtube_url)
-        return {"status": "success", "result": result}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+# Test payloads for the generic stage endpoint - validated by TypeAdapters
+# precompiled at import, not ad-hoc dict checks inside each handler
+class DownloadTestRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    youtube_url: str
 
 
-@app.post("/test-transcribe")
-async def test_transcribe(request: Dict[str, str]):
-    """Test endpoint for transcription functionality"""
-    try:
-        audio_path = request.get("audio_path")
-        if not audio_path:
-            raise HTTPException(status_code=400, detail="audio_path required")
-        
-        result = await pipeline.transcribe_stage.process(audio_path)
-        return {"status": "success", "result": result}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+class TranscribeTestRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    audio_path: str
 
 
-@app.post("/test-translate")
-async def test_translate(request: Dict[str, Any]):
-    """Test endpoint for translation functionality"""
-    try:
-        transcription_data = request.get("transcription_data")
-        target_language = request.get("target_language", "spanish")
-        
-        if not transcription_data:
-            raise HTTPException(status_code=400, detail="transcription_data required")
-        
-        result = await pipeline.translate_stage.process(transcription_data, target_language)
-        return {"status": "success", "result": result}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+class TranslateTestRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    transcription_data: Dict[str, Any]
+    target_language: str = "spanish"
 
 
-@app.post("/test-synthesize")
-async def test_synthesize(request: Dict[str, Any]):
-    """Test endpoint for synthesis functionality"""
-    try:
-        translation_data = request.get("translation_data")
-        
-        if not translation_data:
-            raise HTTPException(status_code=400, detail="translation_data required")
-        
-        # Create mock session info for test endpoint
-        session_info = {"session_id": f"test_{int(time.time())}"}
-        result = await pipeline.synthesize_stage.process(translation_data, session_info)
-        return {"status": "success", "result": result}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+class SynthesizeTestRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    translation_data: Dict[str, Any]
+
+
+class OverlayTestRequest(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+    assembly_data: Dict[str, Any]
+
+
+async def _run_download_test(request: DownloadTestRequest):
+    return await pipeline.download_stage.process(request.youtube_url)
+
+
+async def _run_transcribe_test(request: TranscribeTestRequest):
+    return await pipeline.transcribe_stage.process(request.audio_path)
+
+
+async def _run_translate_test(request: TranslateTestRequest):
+    return await pipeline.translate_stage.process(request.transcription_data, request.target_language)
+
+
+async def _run_synthesize_test(request: SynthesizeTestRequest):
+    # Mock session info so test output lands in a throwaway session dir
+    session_info = {"session_id": f"test_{int(time.time())}"}
+    return await pipeline.synthesize_stage.process(request.translation_data, session_info)
+
 
+async def _run_overlay_test(request: OverlayTestRequest):
+    return await pipeline.overlay_stage.process(request.assembly_data)
 
-@app.post("/test-overlay")
-async def test_overlay(request: Dict[str, Any]):
-    """Test endpoint for overlay functionality"""
+
+_TEST_STAGES = {
+    "download": (TypeAdapter(DownloadTestRequest), _run_download_test),
+    "transcribe": (TypeAdapter(TranscribeTestRequest), _run_transcribe_test),
+    "translate": (TypeAdapter(TranslateTestRequest), _run_translate_test),
+    "synthesize": (TypeAdapter(SynthesizeTestRequest), _run_synthesize_test),
+    "overlay": (TypeAdapter(OverlayTestRequest), _run_overlay_test),
+}
+
+
+@app.post("/test/{stage}")
+async def test_stage(stage: str, payload: Dict[str, Any]):
+    """Run a single pipeline stage in isolation (development only)"""
+    entry = _TEST_STAGES.get(stage)
+    if entry is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown test stage '{stage}'. Available: {sorted(_TEST_STAGES)}"
+        )
+
+    validator, runner = entry
     try:
-        assembly_data = request.get("assembly_data")
-        
-        if not assembly_data:
-            raise HTTPException(status_code=400, detail="assembly_data required (video_path, dubbed_audio_path, session_id)")
-        
-        result = await pipeline.overlay_stage.process(assembly_data)
+        request = validator.validate_python(payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        result = await runner(request)
         return {"status": "success", "result": result}
-        
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -397,11 +385,9 @@ async def process_audio_only(request: VideoRequest):
         )
 
 
-# Mount static files for frontend
-# Check if frontend directory exists
-frontend_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend")
-if os.path.exists(frontend_dir):
-    app.mount("/static", StaticFiles(directory=frontend_dir), name="static")
+# Mount static files for frontend (dev only - see SERVE_FRONTEND above)
+if SERVE_FRONTEND and os.path.exists(FRONTEND_DIR):
+    app.mount("/static", StaticFiles(directory=FRONTEND_DIR), name="static")
 
 
 if __name__ == "__main__":
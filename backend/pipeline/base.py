@@ -39,11 +39,22 @@ class PipelineStage(ABC):
     async def process(self, input_data: Any) -> Any:
         pass
     
-    def log_stage_start(self, stage_name: str, input_info: str):
-        self.logger.info(f"Starting {stage_name}: {input_info}")
-    
-    def log_stage_complete(self, stage_name: str, output_info: str):
-        self.logger.info(f"Completed {stage_name}: {output_info}")
-    
+    # info strings may carry %-style placeholders with values in *args -
+    # interpolation is then deferred to the logging framework, so a
+    # filtered-out level never builds the message at all. Without args the
+    # info string is treated as literal text (it may contain % - URLs,
+    # percentages - that must not reach the formatter).
+    def log_stage_start(self, stage_name: str, input_info: str, *args):
+        if args:
+            self.logger.info("Starting %s: " + input_info, stage_name, *args)
+        else:
+            self.logger.info("Starting %s: %s", stage_name, input_info)
+
+    def log_stage_complete(self, stage_name: str, output_info: str, *args):
+        if args:
+            self.logger.info("Completed %s: " + output_info, stage_name, *args)
+        else:
+            self.logger.info("Completed %s: %s", stage_name, output_info)
+
     def log_error(self, stage_name: str, error: Exception):
-        self.logger.error(f"Error in {stage_name}: {str(error)}")
\ No newline at end of file
+        self.logger.error("Error in %s: %s", stage_name, error)
\ No newline at end of file
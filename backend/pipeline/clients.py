@@ -0,0 +1,27 @@
+import os
+import httpx
+from elevenlabs import ElevenLabs
+
+# One ElevenLabs client (and one underlying connection pool) per process.
+# Stage instances constructing their own clients meant every stage paid its
+# own TLS handshake; with a shared keep-alive pool, transcription and the
+# concurrent synthesis requests reuse warm connections instead.
+_elevenlabs_client = None
+
+
+def get_elevenlabs_client() -> ElevenLabs:
+    """Return the process-wide ElevenLabs client, creating it on first use.
+
+    Callers are responsible for verifying ELEVENLABS_API_KEY is set and
+    raising their own stage-attributed APIError when it isn't.
+    """
+    global _elevenlabs_client
+    if _elevenlabs_client is None:
+        _elevenlabs_client = ElevenLabs(
+            api_key=os.getenv("ELEVENLABS_API_KEY"),
+            httpx_client=httpx.Client(
+                limits=httpx.Limits(max_keepalive_connections=20),
+                timeout=httpx.Timeout(timeout=600.0, connect=10.0)
+            )
+        )
+    return _elevenlabs_client
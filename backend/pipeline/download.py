@@ -1,159 +1,167 @@
 import os
-import time
+import json
+import uuid
+import hashlib
 from typing import Dict, Any
 from .base import PipelineStage, FileError
+from .media import run_ffmpeg, ffprobe_duration, drain_stream_tail
 import subprocess
 import asyncio
 
 
 class DownloadStage(PipelineStage):
     """Downloads video and audio from YouTube URLs using yt-dlp"""
-    
+
+    # Suffix-set membership instead of chained endswith checks - O(1) per
+    # file, and splitext keeps partial downloads like .webm.part from matching
+    VIDEO_EXTS = frozenset({".mp4", ".webm", ".mkv"})
+
+    # Anti-detection fallback used when no cookies file is deployed - built
+    # once at class level, never per call
+    _FALLBACK_AUTH = (
+        "--user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+        "--extractor-args", "youtube:player_client=web"
+    )
+
+
     def __init__(self):
         super().__init__()
         self.output_dir = "outputs/sessions"
+        self.store_dir = "outputs/store"
         self.cookies_file = os.path.join(os.path.dirname(__file__), "..", "cookies.txt")
+        # Resolved once - the cookies file doesn't appear mid-run, so there's
+        # no point stat-ing it on every download
+        self._auth_args = (
+            ("--cookies", self.cookies_file)
+            if os.path.exists(self.cookies_file)
+            else self._FALLBACK_AUTH
+        )
+        # Parallel HLS/DASH fragment downloads per yt-dlp invocation
+        self.concurrent_fragments = os.getenv("YTDLP_CONCURRENT_FRAGMENTS", "4")
+        # In-flight background dedup tasks (kept so they aren't GC'd mid-run)
+        self._dedupe_tasks = set()
     
-    async def process(self, youtube_url: str, video_duration: str = "full", session_id: str = None) -> Dict[str, Any]:
+    async def process(self, youtube_url: str, video_duration: str = "full", session_id: str = None, max_height: int = 480) -> Dict[str, Any]:
         """Download video and extract audio from YouTube URL"""
         if not session_id:
-            session_id = str(int(time.time()))
+            # UUIDs, not second-resolution timestamps - concurrent requests
+            # landing in the same second would share (and clobber) a session dir
+            session_id = str(uuid.uuid4())
         session_dir = os.path.join(self.output_dir, session_id)
         os.makedirs(session_dir, exist_ok=True)
-        
+
+        # Warm restart: when a caller passes a session_id whose directory
+        # already holds the downloaded artifacts (e.g. a pipeline retry after
+        # a later stage failed), reuse them instead of re-downloading
+        cached = await asyncio.to_thread(self._find_cached_download, session_dir)
+        if cached:
+            video_file, audio_file = cached
+            duration = await self._get_audio_duration(audio_file)
+            self.log_stage_complete("Download", "Reused cached artifacts in %s", session_dir)
+            return {
+                'session_id': session_id,
+                'audio_path': audio_file,
+                'video_path': video_file,
+                'duration': duration,
+                'title': None,
+                'video_info': {}
+            }
+
+
         # Determine duration settings
         duration_info = self._get_duration_args(video_duration)
         duration_desc = f" (duration: {duration_info['description']})" if video_duration != "full" else ""
         
-        self.log_stage_start("Download", f"URL: {youtube_url}{duration_desc}")
+        self.log_stage_start("Download", "URL: %s%s", youtube_url, duration_desc)
         
         try:
             # Download video and extract audio using yt-dlp
-            audio_path = os.path.join(session_dir, "original_audio.wav")
+            audio_path = os.path.join(session_dir, "original_audio.flac")
             video_path = os.path.join(session_dir, "original_video.%(ext)s")
             
             # Build base video command with cookie authentication
             video_cmd = [
                 "yt-dlp",
-                "--format", "best[height<=720][ext=mp4]/best[height<=480][ext=mp4]/best[ext=mp4]/best",
+                # The video track only exists to be remuxed with dubbed audio,
+                # so 480p is plenty and 2-4x smaller on the wire than 720p;
+                # format-sort prefers formats at the cap (res:480 ranks
+                # nothing above it), breaking ties toward lower bitrate -
+                # ascending size/bitrate as the primary key would pick 144p
+                "--format", f"bestvideo[height<={max_height}][ext=mp4]+bestaudio[ext=m4a]/best[height<={max_height}][ext=mp4]/best",
+                "--format-sort", f"res:{max_height},+br",
+                "--print-json",  # Emit the info dict so metadata isn't probed again downstream
                 "--no-write-auto-subs",
-                "--no-write-thumbnail", 
-                "--concurrent-fragments", "4",
+                "--no-write-thumbnail",
+                "--concurrent-fragments", self.concurrent_fragments,
                 "--retries", "3",
                 "--fragment-retries", "3",
-                "--sleep-interval", "1",
-                "--max-sleep-interval", "5",
+                "--buffer-size", "64K",  # Larger download buffer, fewer write syscalls
+                # No request pacing on the happy path - yt-dlp's own retry
+                # backoff kicks in if the extractor starts getting throttled
+                "--sleep-requests", "0",
+                "--sleep-interval", "0",
+                "--max-sleep-interval", "0",
                 "--output", video_path
             ]
             
-            # Add cookies if file exists
-            if os.path.exists(self.cookies_file):
-                video_cmd.extend(["--cookies", self.cookies_file])
-            else:
-                # Fallback to anti-detection measures
-                video_cmd.extend([
-                    "--user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-                    "--extractor-args", "youtube:player_client=web"
-                ])
-            
+            # Cookie auth (or anti-detection fallback), decided at __init__
+            video_cmd.extend(self._auth_args)
+
+
             # Add duration arguments if not full video
             if duration_info['args']:
                 video_cmd.extend(duration_info['args'])
             
             video_cmd.append(youtube_url)
             
-            # Build base audio command with cookie authentication
-            audio_cmd = [
-                "yt-dlp", 
-                "--extract-audio",
-                "--audio-format", "wav",
-                "--audio-quality", "0",  # Best quality
-                "--output", audio_path.replace('.wav', '.%(ext)s'),
-                "--no-write-thumbnail",
-                "--retries", "3",
-                "--sleep-interval", "1",
-                "--max-sleep-interval", "5"
-            ]
-            
-            # Add cookies if file exists
-            if os.path.exists(self.cookies_file):
-                audio_cmd.extend(["--cookies", self.cookies_file])
-            else:
-                # Fallback to anti-detection measures
-                audio_cmd.extend([
-                    "--user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-                    "--extractor-args", "youtube:player_client=web"
-                ])
-            
-            # Add duration arguments if not full video
-            if duration_info['args']:
-                audio_cmd.extend(duration_info['args'])
-            
-            audio_cmd.append(youtube_url)
-            
-            # Execute video download first
-            video_process = await asyncio.create_subprocess_exec(
-                *video_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            video_stdout, video_stderr = await video_process.communicate()
-            
-            # Small delay to avoid rate limiting, then start audio download
-            await asyncio.sleep(2)
-            
-            audio_process = await asyncio.create_subprocess_exec(
-                *audio_cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            audio_stdout, audio_stderr = await audio_process.communicate()
-            
-            # Check results
-            if video_process.returncode != 0:
-                self.logger.error(f"Video download stderr: {video_stderr.decode()}")
-                raise FileError(
-                    "Download", "download_error",
-                    f"Video download failed: {video_stderr.decode()[:500]}"
-                )
-            
-            if audio_process.returncode != 0:
-                self.logger.error(f"Audio download stderr: {audio_stderr.decode()}")
-                raise FileError(
-                    "Download", "download_error", 
-                    f"Audio download failed: {audio_stderr.decode()[:500]}"
-                )
-            
-            # Find the actual downloaded files
-            downloaded_files = os.listdir(session_dir)
-            audio_file = None
-            video_file = None
-            
-            for file in downloaded_files:
-                if file.endswith('.wav'):
-                    audio_file = os.path.join(session_dir, file)
-                elif any(file.endswith(ext) for ext in ['.mp4', '.webm', '.mkv']):
-                    video_file = os.path.join(session_dir, file)
-            
-            if not audio_file or not video_file:
+            # One network download: the selected video formats are muxed with
+            # an audio track, so the second yt-dlp invocation (re-fetching the
+            # same audio over the network) is unnecessary - the transcription
+            # audio is extracted locally from the downloaded file below
+            video_stdout = await self._download_video(video_cmd)
+
+            # Parse the info dict yt-dlp printed alongside the video download -
+            # one metadata extraction shared by the whole pipeline
+            video_info = self._parse_video_info(video_stdout)
+
+            # The video path comes from the filenames yt-dlp reported, falling
+            # back to scanning the session dir only when the info dict is
+            # unusable
+            video_file = self._video_path_from_info(video_info)
+            if not video_file:
+                video_file = await asyncio.to_thread(self._find_video_in_dir, session_dir)
+
+            if not video_file:
                 raise FileError(
                     "Download", "file_not_found",
-                    f"Downloaded files not found. Available: {downloaded_files}"
+                    f"Downloaded files not found. Available: {os.listdir(session_dir)}"
                 )
-            
-            # Get audio duration for verification
-            duration = await self._get_audio_duration(audio_file)
+
+            # Extract the transcription audio from the video's own audio track
+            audio_file = await self._extract_audio(video_file, audio_path)
+
+            # Deduplicate the artifacts against the content-addressed store -
+            # housekeeping, not a consumer dependency, so it runs as a
+            # background task while transcription starts on the audio file
+            self._schedule_dedupe(video_file, audio_file)
+
+            # Prefer the duration yt-dlp already reported; only fall back to an
+            # ffprobe subprocess when the metadata doesn't carry it
+            duration = video_info.get('duration')
+            if not duration:
+                duration = await self._get_audio_duration(audio_file)
+            duration = float(duration)
             
             result = {
                 'session_id': session_id,
                 'audio_path': audio_file,
                 'video_path': video_file,
-                'duration': duration
+                'duration': duration,
+                'title': video_info.get('title'),
+                'video_info': video_info
             }
             
-            self.log_stage_complete("Download", f"Audio: {audio_file}, Video: {video_file}")
+            self.log_stage_complete("Download", "Audio: %s, Video: %s", audio_file, video_file)
             return result
             
         except subprocess.SubprocessError as e:
@@ -163,6 +171,154 @@ class DownloadStage(PipelineStage):
             self.log_error("Download", e)
             raise
     
+    async def _download_video(self, video_cmd: list) -> bytes:
+        """Run the video yt-dlp invocation, returning its stdout (info JSON)"""
+        process = await asyncio.create_subprocess_exec(
+            *video_cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        # stdout carries the bounded info JSON; stderr is progress chatter, so
+        # only its tail is kept for error reporting
+        stdout, stderr = await asyncio.gather(
+            process.stdout.read(),
+            drain_stream_tail(process.stderr)
+        )
+        await process.wait()
+
+        if process.returncode != 0:
+            # Only decode stderr when there's actually an error to report
+            error_output = stderr.decode(errors="replace")
+            self.logger.error(f"Video download stderr: {error_output}")
+            raise FileError(
+                "Download", "download_error",
+                f"Video download failed: {error_output[:500]}"
+            )
+        return stdout
+
+    async def _extract_audio(self, source_path: str, audio_path: str) -> str:
+        """Extract the transcription audio track from the downloaded video
+
+        Output is 16 kHz mono FLAC: all the transcription model needs, and
+        lossless FLAC compresses speech to roughly half the equivalent WAV,
+        halving the bytes stored and uploaded to the STT API.
+        """
+        returncode, stderr = await run_ffmpeg(
+            ["-i", source_path, "-vn", "-ar", "16000", "-ac", "1", "-c:a", "flac", audio_path]
+        )
+
+        if returncode != 0:
+            error_output = stderr.decode(errors="replace")
+            self.logger.error(f"Audio extraction stderr: {error_output}")
+            raise FileError(
+                "Download", "audio_extract_error",
+                f"Audio extraction failed: {error_output[:500]}"
+            )
+        return audio_path
+
+    def _schedule_dedupe(self, *paths: str) -> None:
+        """Run content-store dedup in the background, off the critical path.
+
+        Task references are held until completion so they aren't garbage
+        collected mid-hash.
+        """
+        for path in paths:
+            task = asyncio.create_task(asyncio.to_thread(self._dedupe_into_store, path))
+            self._dedupe_tasks.add(task)
+            task.add_done_callback(self._dedupe_tasks.discard)
+
+    def _dedupe_into_store(self, path: str) -> None:
+        """Hardlink an artifact into the content-addressed store.
+
+        If identical content is already stored, the session copy is replaced
+        with a hardlink to it (freeing the duplicate blocks); otherwise the
+        session copy becomes the store entry. Fail-soft: dedup is a disk-space
+        optimization, never worth failing a download over.
+        """
+        try:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    digest.update(chunk)
+
+            os.makedirs(self.store_dir, exist_ok=True)
+            _, ext = os.path.splitext(path)
+            store_path = os.path.join(self.store_dir, digest.hexdigest() + ext)
+
+            if os.path.exists(store_path):
+                # Atomic swap: link the store entry to a temp name, then
+                # replace the artifact in one rename. Transcribe/overlay may
+                # be reading these paths concurrently, so there must never
+                # be a window where the file doesn't exist.
+                tmp_path = path + ".dedup"
+                os.link(store_path, tmp_path)
+                os.replace(tmp_path, path)
+                self.logger.info(f"Deduplicated {path} against content store")
+            else:
+                os.link(path, store_path)
+        except OSError as e:
+            # e.g. store on a different filesystem - hardlinks can't cross devices
+            self.logger.warning(f"Content-store dedup skipped for {path}: {e}")
+
+    @staticmethod
+    def _find_cached_download(session_dir: str) -> tuple:
+        """Return (video_path, audio_path) if both artifacts already exist.
+
+        Files under 1MB are treated as truncated partial downloads and
+        ignored. Runs in a worker thread.
+        """
+        video_file = None
+        audio_file = None
+        try:
+            with os.scandir(session_dir) as entries:
+                for entry in entries:
+                    if not entry.is_file() or entry.stat().st_size < 1024 * 1024:
+                        continue
+                    if entry.name.startswith("original_video."):
+                        video_file = entry.path
+                    elif entry.name.startswith("original_audio."):
+                        audio_file = entry.path
+        except OSError:
+            return None
+        if video_file and audio_file:
+            return video_file, audio_file
+        return None
+
+    @classmethod
+    def _find_video_in_dir(cls, session_dir: str) -> str:
+        """Fallback scan for the downloaded video (runs in a worker thread)"""
+        with os.scandir(session_dir) as entries:
+            for entry in entries:
+                _, ext = os.path.splitext(entry.name)
+                if ext.lower() in cls.VIDEO_EXTS:
+                    return entry.path
+        return None
+
+    def _video_path_from_info(self, video_info: Dict[str, Any]) -> str:
+        """Resolve the downloaded video path from yt-dlp's info dict"""
+        candidates = [
+            download.get('filepath')
+            for download in video_info.get('requested_downloads', [])
+        ]
+        candidates.append(video_info.get('_filename'))
+        candidates.append(video_info.get('filename'))
+
+        for candidate in candidates:
+            if candidate and os.path.exists(candidate):
+                return candidate
+        return None
+
+    def _parse_video_info(self, stdout: bytes) -> Dict[str, Any]:
+        """Parse the info dict emitted by yt-dlp's --print-json"""
+        try:
+            for line in stdout.decode().splitlines():
+                line = line.strip()
+                if line.startswith('{'):
+                    return json.loads(line)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            self.logger.warning(f"Could not parse yt-dlp info JSON: {e}")
+        return {}
+
     def _get_duration_args(self, video_duration: str) -> Dict[str, Any]:
         """Get yt-dlp arguments for duration limiting"""
         if video_duration == "full":
@@ -185,22 +341,4 @@ class DownloadStage(PipelineStage):
     
     async def _get_audio_duration(self, audio_path: str) -> float:
         """Get duration of audio file using ffprobe (if available)"""
-        try:
-            cmd = [
-                "ffprobe", "-v", "quiet", "-show_entries", "format=duration",
-                "-of", "csv=p=0", audio_path
-            ]
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode == 0:
-                return float(stdout.decode().strip())
-            else:
-                return 0.0
-                
-        except Exception:
-            return 0.0
\ No newline at end of file
+        return await ffprobe_duration(audio_path)
\ No newline at end of file
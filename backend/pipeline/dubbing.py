@@ -1,5 +1,6 @@
+import asyncio
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from .download import DownloadStage
 from .transcribe import TranscribeStage
 from .translate import TranslateStage
@@ -8,7 +9,23 @@ from .overlay import OverlayStage
 
 
 class DubbingPipeline:
-    """Main pipeline for video dubbing process"""
+    """Main pipeline for video dubbing process.
+
+    At whole-file granularity the stage graph is a strict chain
+    (download -> transcribe -> translate -> synthesize -> overlay: each stage
+    consumes the full output of the previous one), so a producer/consumer
+    task graph would add scheduling overhead without creating any overlap.
+    Intra-stage work that is not a consumer dependency (e.g. the download
+    stage's content-store dedup) runs off the critical path instead. Translate
+    and synthesize do overlap: long transcripts are split into sentence
+    chunks, all chunk translations run concurrently, and each chunk's TTS
+    starts as soon as its translation lands (_translate_and_synthesize).
+    """
+
+    # Transcript chunk size for pipelined translate->synthesize. Large enough
+    # that Claude keeps conversational context within a chunk, small enough
+    # that several chunks exist to overlap.
+    TRANSLATION_CHUNK_CHARS = 1500
     
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -17,7 +34,50 @@ class DubbingPipeline:
         self.translate_stage = TranslateStage()
         self.synthesize_stage = SynthesizeStage()
         self.overlay_stage = OverlayStage()
-    
+
+    async def _translate_and_synthesize(self, transcribe_result: Dict[str, Any], target_language: str, session_info: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Run translate and synthesize with chunk-level overlap.
+
+        Short transcripts go through the plain sequential path (which also
+        benefits from the TTS cache). Long ones are split on sentence
+        boundaries; every chunk's translation is launched up front and
+        synthesis consumes them in order as they complete, so TTS of chunk k
+        overlaps with translation of chunk k+1.
+        """
+        text = transcribe_result['text']
+        source_language = transcribe_result.get('detected_language', 'unknown')
+
+        chunks = self.synthesize_stage._split_sentences(text, max_chunk_chars=self.TRANSLATION_CHUNK_CHARS)
+        if len(chunks) <= 1:
+            translate_result = await self.translate_stage.process(transcribe_result, target_language)
+            synthesize_result = await self.synthesize_stage.process(translate_result, session_info)
+            return translate_result, synthesize_result
+
+        translation_tasks = [
+            asyncio.create_task(self.translate_stage.process(
+                {'text': chunk, 'detected_language': source_language}, target_language
+            ))
+            for chunk in chunks
+        ]
+        try:
+            synthesize_result = await self.synthesize_stage.process_streaming(
+                translation_tasks, target_language, session_info
+            )
+        except Exception:
+            for task in translation_tasks:
+                task.cancel()
+            raise
+
+        # All translation tasks finished inside process_streaming - stitch the
+        # combined translate result back together for status reporting
+        translate_result = {
+            'translated_text': ' '.join(task.result()['translated_text'] for task in translation_tasks),
+            'source_language': source_language,
+            'target_language': target_language,
+            'original_text': text
+        }
+        return translate_result, synthesize_result
+
     async def process_audio_only(self, youtube_url: str, target_language: str, video_duration: str = "full", session_id: str = None) -> Dict[str, Any]:
         """Process video through audio dubbing pipeline (no video overlay)"""
         results = {}
@@ -32,14 +92,13 @@ class DubbingPipeline:
             transcribe_result = await self.transcribe_stage.process(download_result['audio_path'])
             results['transcribe'] = transcribe_result
             
-            # Stage 3: Translate
-            translate_result = await self.translate_stage.process(transcribe_result, target_language)
+            # Stages 3+4: Translate and Synthesize, pipelined on chunks
+            translate_result, synthesize_result = await self._translate_and_synthesize(
+                transcribe_result, target_language, download_result
+            )
             results['translate'] = translate_result
-            
-            # Stage 4: Synthesize
-            synthesize_result = await self.synthesize_stage.process(translate_result, download_result)
             results['synthesize'] = synthesize_result
-            
+
             # Log completion
             self.logger.info(f"Audio dubbing pipeline completed successfully for session: {download_result['session_id']}")
             self.logger.info(f"Generated dubbed audio: {synthesize_result['synthesized_audio_path']}")
@@ -64,14 +123,13 @@ class DubbingPipeline:
             transcribe_result = await self.transcribe_stage.process(download_result['audio_path'])
             results['transcribe'] = transcribe_result
             
-            # Stage 3: Translate
-            translate_result = await self.translate_stage.process(transcribe_result, target_language)
+            # Stages 3+4: Translate and Synthesize, pipelined on chunks
+            translate_result, synthesize_result = await self._translate_and_synthesize(
+                transcribe_result, target_language, download_result
+            )
             results['translate'] = translate_result
-            
-            # Stage 4: Synthesize
-            synthesize_result = await self.synthesize_stage.process(translate_result, download_result)
             results['synthesize'] = synthesize_result
-            
+
             # Stage 5: Overlay (Video Assembly)
             overlay_data = {
                 'video_path': download_result['video_path'],
@@ -0,0 +1,142 @@
+import os
+import json
+import asyncio
+import logging
+from typing import List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ffmpeg is inherently one-job-per-process (a long-lived daemon would need
+# fragile named-pipe plumbing and serialize unrelated jobs anyway), so the
+# shared helpers here focus on keeping spawns cheap and bounded: every stage
+# funnels through one code path, and a semaphore caps how many encoders run
+# at once so concurrent sessions don't fork-bomb the box.
+_FFMPEG_MAX_CONCURRENCY = int(os.getenv("FFMPEG_MAX_CONCURRENCY", "4"))
+_ffmpeg_semaphore = asyncio.Semaphore(_FFMPEG_MAX_CONCURRENCY)
+
+
+# How much trailing stderr to keep from a subprocess - enough for error
+# reporting without buffering megabytes of ffmpeg/yt-dlp progress chatter
+STDERR_TAIL_BYTES = 64 * 1024
+
+
+async def drain_stream_tail(stream, limit: int = STDERR_TAIL_BYTES) -> bytes:
+    """Drain a subprocess stream, keeping only the last `limit` bytes.
+
+    Long jobs write a steady stream of progress lines to stderr;
+    communicate() would buffer all of it just to report the (tail-located)
+    error message on failure.
+    """
+    tail = b""
+    while True:
+        chunk = await stream.read(64 * 1024)
+        if not chunk:
+            return tail
+        tail = (tail + chunk)[-limit:]
+
+
+async def run_ffmpeg(args: List[str]) -> Tuple[int, bytes]:
+    """Run one ffmpeg job (always with -y) and return (returncode, stderr tail).
+
+    Callers decide how to surface failures so stage/error-type attribution
+    stays with the stage that owns the job. stdout goes to /dev/null - ffmpeg
+    output lands in files - and stderr is drained with a bounded buffer.
+    """
+    cmd = ["ffmpeg", "-y"] + list(args)
+    async with _ffmpeg_semaphore:
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stderr = await drain_stream_tail(process.stderr)
+        await process.wait()
+    return process.returncode, stderr
+
+
+# Probe cache keyed by (path, mtime, size) so an unchanged file never costs
+# a second ffprobe spawn; any rewrite changes the key automatically. In-flight
+# probes are single-flighted too: concurrent callers asking about the same
+# file await one shared subprocess instead of each paying the ~50ms spawn.
+# (A long-lived ffprobe daemon would amortize spawns further, but needs
+# custom pipe framing for no measurable win once results are cached.)
+_probe_cache = {}
+_probe_inflight = {}
+_PROBE_CACHE_MAX = 256
+
+
+async def ffprobe_info(media_path: str) -> dict:
+    """Probe a media file once, returning ffprobe's JSON info (format + streams).
+
+    One spawn yields everything callers ask about (duration, codecs, stream
+    layout) instead of a csv-formatted probe per field. Returns {} on any
+    failure.
+    """
+    try:
+        stat = os.stat(media_path)
+        cache_key = (media_path, stat.st_mtime, stat.st_size)
+    except OSError:
+        cache_key = None
+
+    if cache_key is not None:
+        if cache_key in _probe_cache:
+            return _probe_cache[cache_key]
+        inflight = _probe_inflight.get(cache_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        task = asyncio.ensure_future(_ffprobe_spawn(media_path, cache_key))
+        _probe_inflight[cache_key] = task
+        try:
+            return await asyncio.shield(task)
+        finally:
+            _probe_inflight.pop(cache_key, None)
+
+    return await _ffprobe_spawn(media_path, cache_key)
+
+
+async def _ffprobe_spawn(media_path: str, cache_key) -> dict:
+    """Run the actual ffprobe subprocess and populate the cache"""
+    try:
+        cmd = [
+            "ffprobe", "-v", "quiet", "-print_format", "json",
+            "-show_format", "-show_streams", media_path
+        ]
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+
+        if process.returncode == 0 and stdout:
+            info = json.loads(stdout)
+            if cache_key is not None:
+                if len(_probe_cache) >= _PROBE_CACHE_MAX:
+                    _probe_cache.clear()
+                _probe_cache[cache_key] = info
+            return info
+
+        logger.warning(f"Could not probe {media_path}")
+        return {}
+
+    except Exception as e:
+        logger.warning(f"Error probing {media_path}: {str(e)}")
+        return {}
+
+
+async def ffprobe_duration(media_path: str) -> float:
+    """Get the duration of a media file via ffprobe, 0.0 on any failure"""
+    info = await ffprobe_info(media_path)
+    try:
+        return float(info.get("format", {}).get("duration", 0.0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+async def audio_codec_name(media_path: str) -> str:
+    """Codec name of the first audio stream, '' when unknown"""
+    info = await ffprobe_info(media_path)
+    for stream in info.get("streams", []):
+        if stream.get("codec_type") == "audio":
+            return stream.get("codec_name", "")
+    return ""
@@ -4,13 +4,17 @@ import subprocess
 import tempfile
 from typing import Dict, Any
 from .base import PipelineStage, FileError, PipelineError
+from .media import run_ffmpeg, ffprobe_duration, audio_codec_name
 
 
 class OverlayStage(PipelineStage):
     """Stage for overlaying dubbed audio onto the original video using ffmpeg"""
     
-    def __init__(self):
+    def __init__(self, output_root: str = "outputs"):
         super().__init__()
+        # Where session dirs live - production keeps the default; tests
+        # inject a temp dir so parallel workers never collide
+        self.output_root = str(output_root)
     
     async def process(self, assembly_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -33,16 +37,18 @@ class OverlayStage(PipelineStage):
             if not video_path or not dubbed_audio_path:
                 raise FileError("Overlay", "missing_input", "Video path and dubbed audio path are required")
             
-            if not os.path.exists(video_path):
+            # Input stats run in the thread pool - a slow disk here shouldn't
+            # stall every other request on the event loop
+            if not await asyncio.to_thread(os.path.exists, video_path):
                 raise FileError("Overlay", "file_not_found", f"Video file not found: {video_path}")
-            
-            if not os.path.exists(dubbed_audio_path):
+
+            if not await asyncio.to_thread(os.path.exists, dubbed_audio_path):
                 raise FileError("Overlay", "file_not_found", f"Dubbed audio file not found: {dubbed_audio_path}")
             
-            self.log_stage_start("Overlay", f"Video: {os.path.basename(video_path)}, Audio: {os.path.basename(dubbed_audio_path)}")
+            self.log_stage_start("Overlay", "Video: %s, Audio: %s", os.path.basename(video_path), os.path.basename(dubbed_audio_path))
             
             # Use existing session directory (should already exist from download/synthesize stages)
-            session_dir = f"outputs/sessions/{session_id}"
+            session_dir = os.path.join(self.output_root, "sessions", session_id)
             if not os.path.exists(session_dir):
                 os.makedirs(session_dir, exist_ok=True)
                 self.logger.warning(f"Session directory did not exist, created: {session_dir}")
@@ -55,48 +61,49 @@ class OverlayStage(PipelineStage):
             # -map 0:v:0: Use video stream from first input (original video)
             # -map 1:a:0: Use audio stream from second input (dubbed audio)
             # -shortest: Match duration to shortest input (prevents issues with audio/video length mismatch)
-            cmd = [
-                'ffmpeg',
-                '-y',  # Overwrite output file if it exists
+            # If the dubbed audio is already AAC, mux it with stream copy
+            # instead of decoding and re-encoding it (probe is cached, and
+            # codec-based detection doesn't trust file extensions)
+            audio_codec = 'copy' if await audio_codec_name(dubbed_audio_path) == 'aac' else 'aac'
+
+            args = [
                 '-i', video_path,        # Input video
                 '-i', dubbed_audio_path, # Input dubbed audio
                 '-c:v', 'copy',          # Copy video codec
-                '-c:a', 'aac',           # Audio codec
+                '-c:a', audio_codec,     # Audio codec (copy when already AAC)
                 '-map', '0:v:0',         # Map video from first input
-                '-map', '1:a:0',         # Map audio from second input  
+                '-map', '1:a:0',         # Map audio from second input
                 '-shortest',             # Match shortest duration
                 '-avoid_negative_ts', 'make_zero',  # Handle timestamp issues
+                # Move moov to the front so browsers can start playback before
+                # the whole file downloads; with -c:v copy this is a cheap
+                # header rewrite, not a re-encode
+                '-movflags', '+faststart',
                 output_path
             ]
-            
-            self.logger.info(f"Running ffmpeg command: {' '.join(cmd)}")
-            
+
+            self.logger.info(f"Running ffmpeg overlay: {' '.join(args)}")
+
             # Execute ffmpeg command
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode != 0:
+            returncode, stderr = await run_ffmpeg(args)
+
+            if returncode != 0:
                 error_msg = stderr.decode('utf-8') if stderr else "Unknown ffmpeg error"
-                self.logger.error(f"ffmpeg failed with return code {process.returncode}: {error_msg}")
+                self.logger.error(f"ffmpeg failed with return code {returncode}: {error_msg}")
                 raise PipelineError("Overlay", "ffmpeg_error", f"Video overlay failed: {error_msg}")
             
             # Verify output file was created and has reasonable size
-            if not os.path.exists(output_path):
+            if not await asyncio.to_thread(os.path.exists, output_path):
                 raise FileError("Overlay", "output_not_created", "Output video file was not created")
-            
-            file_size = os.path.getsize(output_path)
+
+            file_size = await asyncio.to_thread(os.path.getsize, output_path)
             if file_size < 1024:  # Less than 1KB is likely an error
                 raise FileError("Overlay", "output_too_small", f"Output file is suspiciously small: {file_size} bytes")
             
             # Get video info for verification
             duration = await self._get_video_duration(output_path)
             
-            self.log_stage_complete("Overlay", f"Created {os.path.basename(output_path)} ({file_size:,} bytes, {duration:.1f}s)")
+            self.log_stage_complete("Overlay", "Created %s (%d bytes, %.1fs)", os.path.basename(output_path), file_size, duration)
             
             return {
                 'final_video_path': output_path,
@@ -114,32 +121,7 @@ class OverlayStage(PipelineStage):
     
     async def _get_video_duration(self, video_path: str) -> float:
         """Get video duration using ffprobe"""
-        try:
-            cmd = [
-                'ffprobe',
-                '-v', 'quiet',
-                '-show_entries', 'format=duration',
-                '-of', 'csv=p=0',
-                video_path
-            ]
-            
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            
-            stdout, stderr = await process.communicate()
-            
-            if process.returncode == 0 and stdout:
-                return float(stdout.decode().strip())
-            else:
-                self.logger.warning(f"Could not get video duration: {stderr.decode() if stderr else 'Unknown error'}")
-                return 0.0
-                
-        except Exception as e:
-            self.logger.warning(f"Error getting video duration: {str(e)}")
-            return 0.0
+        return await ffprobe_duration(video_path)
     
     def validate_inputs(self, video_path: str, audio_path: str) -> bool:
         """Validate that input files exist and are readable"""
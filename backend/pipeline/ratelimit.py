@@ -0,0 +1,97 @@
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveRateLimiter:
+    """AIMD admission control for calls to a third-party API.
+
+    Requests are paced by a per-provider interval that follows the classic
+    additive-increase/multiplicative-decrease pattern in reverse (it governs
+    spacing, not rate): every success shaves a little off the interval, a 429
+    doubles it (or honors the server's retry-after when present). Throttled
+    calls are retried after the pause instead of failing the whole job, so a
+    transient 429 during sentence-chunk fan-out costs a short sleep, not a
+    session. A semaphore additionally bounds in-flight calls per provider.
+    """
+
+    # Per-success additive decrease of the admission interval (seconds)
+    _INTERVAL_DECREASE = 0.05
+    # First backoff interval applied on a throttle when none is active
+    _INITIAL_BACKOFF = 0.5
+    # Ceiling for the admission interval (seconds)
+    _MAX_INTERVAL = 30.0
+
+    def __init__(self, name: str, max_concurrency: int = 4, max_retries: int = 3):
+        self.name = name
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._max_retries = max_retries
+        self._interval = 0.0
+        self._next_slot = 0.0
+
+    @staticmethod
+    def _is_rate_limit(exc: Exception) -> bool:
+        text = str(exc).lower()
+        return "429" in text or "rate limit" in text or "too many requests" in text
+
+    @staticmethod
+    def _retry_after(exc: Exception) -> float:
+        """Server-suggested pause from a response's retry-after, 0 if absent"""
+        headers = getattr(getattr(exc, "response", None), "headers", None)
+        if headers is not None:
+            try:
+                return float(headers.get("retry-after", 0))
+            except (TypeError, ValueError):
+                pass
+        return 0.0
+
+    async def run(self, call, *args, **kwargs):
+        """Invoke an awaitable-returning callable under admission control.
+
+        Retries rate-limited calls up to max_retries times with the current
+        backoff; all other exceptions propagate untouched so stages keep
+        their own error attribution.
+        """
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                await self._pace()
+                try:
+                    result = await call(*args, **kwargs)
+                except Exception as e:
+                    if self._is_rate_limit(e):
+                        pause = self._on_throttle(e)
+                        if attempt < self._max_retries:
+                            attempt += 1
+                            logger.warning(
+                                f"{self.name}: rate limited, retrying in {pause:.1f}s "
+                                f"(attempt {attempt}/{self._max_retries})"
+                            )
+                            await asyncio.sleep(pause)
+                            continue
+                    raise
+                self._on_success()
+                return result
+
+    async def _pace(self):
+        """Wait for this call's admission slot"""
+        now = time.monotonic()
+        wait = self._next_slot - now
+        self._next_slot = max(now, self._next_slot) + self._interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def _on_success(self):
+        self._interval = max(0.0, self._interval - self._INTERVAL_DECREASE)
+
+    def _on_throttle(self, exc: Exception) -> float:
+        doubled = self._interval * 2 if self._interval else self._INITIAL_BACKOFF
+        self._interval = min(self._MAX_INTERVAL, max(doubled, self._retry_after(exc)))
+        return self._interval
+
+
+# One limiter per provider, shared by every stage in the process
+anthropic_limiter = AdaptiveRateLimiter("anthropic")
+elevenlabs_limiter = AdaptiveRateLimiter("elevenlabs")
@@ -1,21 +1,93 @@
 import os
+import re
 import time
-from typing import Dict, Any
-from elevenlabs import ElevenLabs
+import types
+import wave
+import asyncio
+import hashlib
+from typing import Dict, Any, List
 from .base import PipelineStage, APIError, FileError
+from .clients import get_elevenlabs_client
+from .ratelimit import elevenlabs_limiter
+
+# Sentence boundary after terminal punctuation - compiled once at import,
+# used per chunk by the sentence-split fan-out
+_SENT_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+')
 
 
 class SynthesizeStage(PipelineStage):
     """Speech synthesis stage using ElevenLabs TTS"""
-    
-    def __init__(self):
+
+    # Raw PCM out of the API instead of MP3: chunks concatenate sample-exact
+    # (no frame boundaries), and the overlay's ffmpeg pass skips an MP3
+    # decode. pcm_44100 is 16-bit mono little-endian at 44.1 kHz.
+    _OUTPUT_FORMAT = "pcm_44100"
+    _SAMPLE_RATE = 44100
+    _SAMPLE_WIDTH = 2
+    _CHANNELS = 1
+
+    # Rachel - reliable default female voice
+    _DEFAULT_VOICE = '21m00Tcm4TlvDq8ikWAM'
+
+    # Content-addressed synthesis cache: identical (voice, model, text)
+    # requests - pipeline retries after a failed overlay, repeated test runs -
+    # reuse the audio on disk instead of re-billing the TTS API
+    _TTS_CACHE_SUBDIR = ".tts_cache"
+
+    # Flat language-or-code -> ElevenLabs voice ID map, built once at class
+    # load. Voices chosen for how well they handle each language with the
+    # multilingual v2 model: Rachel (21m00...), Sarah (EXAVIT...), Laura
+    # (FGY2Wh...). Sentence-chunked synthesis hits this per chunk, so lookup
+    # is a single dict get, not a chained name->code resolution. The proxy
+    # makes the table read-only, so it's safely shared across instances and
+    # worker threads without defensive copies.
+    _VOICE_MAP = types.MappingProxyType({
+        'english': '21m00Tcm4TlvDq8ikWAM', 'en': '21m00Tcm4TlvDq8ikWAM',
+        'spanish': '21m00Tcm4TlvDq8ikWAM', 'es': '21m00Tcm4TlvDq8ikWAM',
+        'french': 'EXAVITQu4vr4xnSDxMaL', 'fr': 'EXAVITQu4vr4xnSDxMaL',
+        'german': 'FGY2WhTYpPnrIDTdsKH5', 'de': 'FGY2WhTYpPnrIDTdsKH5',
+        'italian': '21m00Tcm4TlvDq8ikWAM', 'it': '21m00Tcm4TlvDq8ikWAM',
+        'portuguese': '21m00Tcm4TlvDq8ikWAM', 'pt': '21m00Tcm4TlvDq8ikWAM',
+        'polish': 'FGY2WhTYpPnrIDTdsKH5', 'pl': 'FGY2WhTYpPnrIDTdsKH5',
+        'turkish': 'EXAVITQu4vr4xnSDxMaL', 'tr': 'EXAVITQu4vr4xnSDxMaL',
+        'russian': 'FGY2WhTYpPnrIDTdsKH5', 'ru': 'FGY2WhTYpPnrIDTdsKH5',
+        'dutch': 'EXAVITQu4vr4xnSDxMaL', 'nl': 'EXAVITQu4vr4xnSDxMaL',
+        'swedish': 'FGY2WhTYpPnrIDTdsKH5', 'sv': 'FGY2WhTYpPnrIDTdsKH5',
+        'norwegian': 'FGY2WhTYpPnrIDTdsKH5', 'no': 'FGY2WhTYpPnrIDTdsKH5',
+        'danish': 'FGY2WhTYpPnrIDTdsKH5', 'da': 'FGY2WhTYpPnrIDTdsKH5',
+        'finnish': 'FGY2WhTYpPnrIDTdsKH5', 'fi': 'FGY2WhTYpPnrIDTdsKH5',
+        'japanese': 'EXAVITQu4vr4xnSDxMaL', 'ja': 'EXAVITQu4vr4xnSDxMaL',
+        'chinese': 'EXAVITQu4vr4xnSDxMaL', 'zh': 'EXAVITQu4vr4xnSDxMaL',
+        'korean': 'EXAVITQu4vr4xnSDxMaL', 'ko': 'EXAVITQu4vr4xnSDxMaL',
+        'hindi': 'EXAVITQu4vr4xnSDxMaL', 'hi': 'EXAVITQu4vr4xnSDxMaL',
+        'arabic': 'EXAVITQu4vr4xnSDxMaL', 'ar': 'EXAVITQu4vr4xnSDxMaL',
+    })
+
+
+    def __init__(self, latency_mode: str = None, output_root: str = "outputs"):
         super().__init__()
         api_key = os.getenv("ELEVENLABS_API_KEY")
         if not api_key:
             raise APIError("Synthesize", "missing_api_key", "ELEVENLABS_API_KEY not found in environment")
-        
-        self.client = ElevenLabs(api_key=api_key)
-    
+
+        self.client = get_elevenlabs_client()
+        # Where session dirs, fallback files and the TTS cache live -
+        # production keeps the default; tests inject a temp dir so
+        # parallel workers never collide on shared paths
+        self.output_root = str(output_root)
+        # Caps concurrent TTS requests so sentence fan-out respects the
+        # ElevenLabs plan's request limits
+        self._tts_semaphore = asyncio.Semaphore(int(os.getenv("TTS_MAX_CONCURRENCY", "3")))
+        # Session dirs already created by this stage - skips the mkdir
+        # syscall on every subsequent call into the same session
+        self._made_session_dirs = set()
+        # DUB_TTS_LATENCY=low trades some quality for Flash's much lower
+        # time-to-first-byte - useful for dev and interactive previews;
+        # production defaults to multilingual v2 quality
+        if latency_mode is None:
+            latency_mode = os.getenv("DUB_TTS_LATENCY", "high")
+        self.model_id = "eleven_flash_v2_5" if latency_mode == "low" else "eleven_multilingual_v2"
+
     async def process(self, translation_data: Dict, session_info: Dict = None) -> Dict[str, Any]:
         """
         Generate speech from translated text using ElevenLabs TTS
@@ -30,55 +102,52 @@ class SynthesizeStage(PipelineStage):
         translated_text = translation_data['translated_text']
         target_language = translation_data['target_language']
         
-        self.log_stage_start("Synthesis", 
-                           f"Generating {target_language} speech from {len(translated_text)} characters")
+        self.log_stage_start("Synthesis",
+                           "Generating %s speech from %d characters", target_language, len(translated_text))
         
         try:
-            # Determine output directory - use session if available, otherwise fallback
-            if session_info and 'session_id' in session_info:
-                session_dir = f"outputs/sessions/{session_info['session_id']}"
-                os.makedirs(session_dir, exist_ok=True)
-                output_path = os.path.join(session_dir, "dubbed_audio.mp3")
-                self.logger.info(f"Using session directory: {session_dir}")
-            else:
-                # Fallback for standalone testing - but log this as it shouldn't happen in normal pipeline
-                self.logger.warning(f"No session_info provided, using fallback directory. session_info: {session_info}")
-                os.makedirs("outputs", exist_ok=True)
-                output_path = f"outputs/synthesized_{int(time.time())}.mp3"
-            
+            output_path = self._resolve_output_path(session_info)
+
             # Select appropriate voice for language
             voice_id = self._select_voice_for_language(target_language)
             
-            # Generate speech using ElevenLabs new API
-            audio_generator = self.client.text_to_speech.convert(
-                voice_id=voice_id,
-                text=translated_text,
-                model_id="eleven_multilingual_v2",  # Supports multiple languages
-                output_format="mp3_44100_128"
-            )
-            
-            # Collect audio data
-            audio_data = b""
-            for chunk in audio_generator:
-                audio_data += chunk
-            
-            # Save the generated audio to file
-            with open(output_path, "wb") as f:
-                f.write(audio_data)
-            
-            # Verify file was created successfully
-            if not os.path.exists(output_path):
+            # Cache hit: identical (voice, model, text) was already
+            # synthesized - link it into the session and skip the API entirely
+            cache_path = self._tts_cache_path(voice_id, translated_text)
+            bytes_written = await asyncio.to_thread(self._copy_from_cache, cache_path, output_path)
+
+            if bytes_written:
+                self.logger.info(f"TTS cache hit, reusing {cache_path}")
+            else:
+                # Long texts are split into sentences synthesized concurrently -
+                # per-request TTFB overlaps instead of stacking - then written to
+                # disk in order. Short texts take the single streaming request.
+                sentences = self._split_sentences(translated_text)
+                if len(sentences) > 1:
+                    bytes_written = await self._synthesize_sentences(sentences, voice_id, output_path)
+                else:
+                    bytes_written = await elevenlabs_limiter.run(
+                        asyncio.to_thread,
+                        self._stream_tts_to_file, voice_id, translated_text, output_path
+                    )
+                if bytes_written:
+                    await asyncio.to_thread(self._store_in_cache, output_path, cache_path)
+
+            if bytes_written == 0:
                 raise FileError("Synthesize", "file_creation", f"Failed to create audio file at {output_path}")
-            
+
             result = {
                 'synthesized_audio_path': output_path,
                 'language': target_language,
                 'voice_used': voice_id,
-                'text_length': len(translated_text)
+                'text_length': len(translated_text),
+                # Already counted while writing - lets callers check the
+                # audio size without re-statting the file
+                'audio_bytes_len': bytes_written
             }
-            
-            self.log_stage_complete("Synthesis", 
-                                  f"Generated audio file: {output_path} using voice '{voice_id}'")
+
+            self.log_stage_complete("Synthesis",
+                                  "Generated audio file: %s using voice '%s'", output_path, voice_id)
             
             return result
             
@@ -95,71 +164,210 @@ class SynthesizeStage(PipelineStage):
             else:
                 raise APIError("Synthesize", "tts_error", f"Text-to-speech failed: {str(e)}")
     
+    def _split_sentences(self, text: str, max_chunk_chars: int = 400) -> List[str]:
+        """Split text on sentence boundaries, merging tiny sentences together.
+
+        Merging keeps each TTS request a reasonable size - one API call per
+        three-word sentence would trade latency for request overhead.
+        """
+        sentences = _SENT_BOUNDARY_RE.split(text.strip())
+        chunks = []
+        current = ""
+        for sentence in sentences:
+            if current and len(current) + len(sentence) + 1 > max_chunk_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}".strip()
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _synthesize_sentences(self, sentences: List[str], voice_id: str, output_path: str) -> int:
+        """Synthesize sentence chunks concurrently and write them in order"""
+        async def synth(sentence: str) -> bytes:
+            async with self._tts_semaphore:
+                return await elevenlabs_limiter.run(
+                    asyncio.to_thread, self._synthesize_bytes, voice_id, sentence
+                )
+
+        audio_chunks = await asyncio.gather(*(synth(s) for s in sentences))
+
+        def write_chunks() -> int:
+            bytes_written = 0
+            with self._open_wav(output_path) as f:
+                for chunk in audio_chunks:
+                    f.writeframes(chunk)
+                    bytes_written += len(chunk)
+            return bytes_written
+
+        return await asyncio.to_thread(write_chunks)
+
+    def _resolve_output_path(self, session_info: Dict = None) -> str:
+        """Determine the output path - session dir if available, otherwise fallback"""
+        if session_info and 'session_id' in session_info:
+            session_dir = os.path.join(self.output_root, "sessions", session_info['session_id'])
+            if session_dir not in self._made_session_dirs:
+                os.makedirs(session_dir, exist_ok=True)
+                self._made_session_dirs.add(session_dir)
+            self.logger.info(f"Using session directory: {session_dir}")
+            return os.path.join(session_dir, "dubbed_audio.wav")
+
+        # Fallback for standalone testing - but log this as it shouldn't happen in normal pipeline
+        self.logger.warning(f"No session_info provided, using fallback directory. session_info: {session_info}")
+        os.makedirs(self.output_root, exist_ok=True)
+        return os.path.join(self.output_root, f"synthesized_{int(time.time())}.wav")
+
+    async def process_streaming(self, translation_tasks, target_language: str, session_info: Dict = None) -> Dict[str, Any]:
+        """
+        Synthesize translated chunks as their translations complete
+
+        Used by the pipeline for chunked translate->synthesize overlap: each
+        element of translation_tasks is an awaitable resolving to a
+        TranslateStage result, and its audio is synthesized as soon as that
+        translation lands - TTS for chunk k runs while chunk k+1 is still
+        being translated. Audio is written to the session WAV in chunk order.
+
+        Args:
+            translation_tasks: Ordered awaitables of TranslateStage results
+            target_language: Target language (for voice selection)
+            session_info: Dict containing 'session_id' for file organization
+
+        Returns:
+            Dict with synthesized_audio_path, language, voice_used
+        """
+        self.log_stage_start("Synthesis",
+                           "Pipelined synthesis of %d %s chunks", len(translation_tasks), target_language)
+
+        try:
+            output_path = self._resolve_output_path(session_info)
+            voice_id = self._select_voice_for_language(target_language)
+
+            async def synth(task):
+                translation = await task
+                text = translation['translated_text']
+                async with self._tts_semaphore:
+                    audio = await elevenlabs_limiter.run(
+                        asyncio.to_thread, self._synthesize_bytes, voice_id, text
+                    )
+                return len(text), audio
+
+            synthesized = await asyncio.gather(*(synth(t) for t in translation_tasks))
+            text_length = sum(chars for chars, _ in synthesized)
+            audio_chunks = [audio for _, audio in synthesized]
+
+            def write_chunks() -> int:
+                bytes_written = 0
+                with self._open_wav(output_path) as f:
+                    for chunk in audio_chunks:
+                        f.writeframes(chunk)
+                        bytes_written += len(chunk)
+                return bytes_written
+
+            bytes_written = await asyncio.to_thread(write_chunks)
+            if bytes_written == 0:
+                raise FileError("Synthesize", "file_creation", f"Failed to create audio file at {output_path}")
+
+            result = {
+                'synthesized_audio_path': output_path,
+                'language': target_language,
+                'voice_used': voice_id,
+                'text_length': text_length,
+                'audio_bytes_len': bytes_written
+            }
+
+            self.log_stage_complete("Synthesis",
+                                  "Generated audio file: %s using voice '%s'", output_path, voice_id)
+            return result
+
+        except Exception as e:
+            self.log_error("Synthesis", e)
+            if isinstance(e, (APIError, FileError)):
+                raise
+            if "rate limit" in str(e).lower():
+                raise APIError("Synthesize", "rate_limit", f"ElevenLabs rate limit exceeded: {str(e)}")
+            raise APIError("Synthesize", "tts_error", f"Text-to-speech failed: {str(e)}")
+
+    def _tts_cache_path(self, voice_id: str, text: str) -> str:
+        """Cache path for a (voice, model, text) synthesis request"""
+        key = hashlib.sha256(f"{voice_id}|{self.model_id}|{text}".encode()).hexdigest()
+        # Under output_root so cache hits can hardlink within one filesystem
+        return os.path.join(self.output_root, self._TTS_CACHE_SUBDIR, f"{key}.wav")
+
+    def _copy_from_cache(self, cache_path: str, output_path: str) -> int:
+        """Hardlink a cached synthesis into the session; 0 on miss.
+
+        Runs in a worker thread. Fail-soft: any cache problem just means a
+        fresh synthesis.
+        """
+        try:
+            size = os.path.getsize(cache_path)
+            if size == 0:
+                return 0
+            if os.path.exists(output_path):
+                os.remove(output_path)
+            os.link(cache_path, output_path)
+            return size
+        except OSError:
+            return 0
+
+    def _store_in_cache(self, output_path: str, cache_path: str) -> None:
+        """Link a fresh synthesis into the cache (runs in a worker thread)"""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            if not os.path.exists(cache_path):
+                os.link(output_path, cache_path)
+        except OSError as e:
+            # e.g. cache dir on a different filesystem - not worth failing over
+            self.logger.warning(f"TTS cache store skipped: {e}")
+
+    def _open_wav(self, output_path: str):
+        """Open a WAV writer for the stage's PCM format (header auto-managed)"""
+        f = wave.open(output_path, "wb")
+        f.setnchannels(self._CHANNELS)
+        f.setsampwidth(self._SAMPLE_WIDTH)
+        f.setframerate(self._SAMPLE_RATE)
+        return f
+
+    def _synthesize_bytes(self, voice_id: str, text: str) -> bytes:
+        """Run one TTS request and return its raw PCM (runs in a worker thread)"""
+        audio_generator = self.client.text_to_speech.convert(
+            voice_id=voice_id,
+            text=text,
+            model_id=self.model_id,
+            output_format=self._OUTPUT_FORMAT
+        )
+        return b"".join(audio_generator)
+
+    def _stream_tts_to_file(self, voice_id: str, text: str, output_path: str) -> int:
+        """Run one TTS request, writing PCM chunks to a WAV as they arrive.
+
+        Blocking SDK call - runs in a worker thread. Returns bytes written.
+        """
+        audio_generator = self.client.text_to_speech.convert(
+            voice_id=voice_id,
+            text=text,
+            model_id=self.model_id,
+            output_format=self._OUTPUT_FORMAT
+        )
+
+        bytes_written = 0
+        with self._open_wav(output_path) as f:
+            for chunk in audio_generator:
+                f.writeframes(chunk)
+                bytes_written += len(chunk)
+        return bytes_written
+
     def _select_voice_for_language(self, target_language: str) -> str:
         """
         Select appropriate voice ID for target language
-        
+
         Returns:
             Voice ID suitable for the target language
         """
-        # Language to voice ID mapping - using actual ElevenLabs voice IDs
-        # These are voices that work well with eleven_multilingual_v2 model
-        language_voice_map = {
-            'english': '21m00Tcm4TlvDq8ikWAM',    # Rachel - clear female voice, excellent for English
-            'spanish': '21m00Tcm4TlvDq8ikWAM',    # Rachel - clear female voice
-            'french': 'EXAVITQu4vr4xnSDxMaL',     # Sarah - female voice
-            'german': 'FGY2WhTYpPnrIDTdsKH5',     # Laura - female voice
-            'italian': '21m00Tcm4TlvDq8ikWAM',   # Rachel works well for Italian
-            'portuguese': '21m00Tcm4TlvDq8ikWAM', # Rachel works for Portuguese
-            'polish': 'FGY2WhTYpPnrIDTdsKH5',     # Laura works for Polish
-            'turkish': 'EXAVITQu4vr4xnSDxMaL',   # Sarah works for Turkish
-            'russian': 'FGY2WhTYpPnrIDTdsKH5',   # Laura works for Russian
-            'dutch': 'EXAVITQu4vr4xnSDxMaL',     # Sarah works for Dutch
-            'swedish': 'FGY2WhTYpPnrIDTdsKH5',   # Laura works for Swedish
-            'norwegian': 'FGY2WhTYpPnrIDTdsKH5', # Laura works for Norwegian
-            'danish': 'FGY2WhTYpPnrIDTdsKH5',    # Laura works for Danish
-            'finnish': 'FGY2WhTYpPnrIDTdsKH5',   # Laura works for Finnish
-            'japanese': 'EXAVITQu4vr4xnSDxMaL',  # Sarah works for Japanese
-            'chinese': 'EXAVITQu4vr4xnSDxMaL',   # Sarah works for Chinese
-            'korean': 'EXAVITQu4vr4xnSDxMaL',    # Sarah works for Korean
-            'hindi': 'EXAVITQu4vr4xnSDxMaL',     # Sarah works for Hindi
-            'arabic': 'EXAVITQu4vr4xnSDxMaL',    # Sarah works for Arabic
-        }
-        
-        # Normalize language name (handle "es", "español", "spanish" etc.)
-        normalized_language = target_language.lower().strip()
-        
-        # Try exact match first
-        if normalized_language in language_voice_map:
-            return language_voice_map[normalized_language]
-        
-        # Try common language code mappings
-        language_code_map = {
-            'en': 'english',
-            'es': 'spanish',
-            'fr': 'french', 
-            'de': 'german',
-            'it': 'italian',
-            'pt': 'portuguese',
-            'pl': 'polish',
-            'tr': 'turkish',
-            'ru': 'russian',
-            'nl': 'dutch',
-            'sv': 'swedish',
-            'no': 'norwegian',
-            'da': 'danish',
-            'fi': 'finnish',
-            'ja': 'japanese',
-            'zh': 'chinese',
-            'ko': 'korean',
-            'hi': 'hindi',
-            'ar': 'arabic'
-        }
-        
-        if normalized_language in language_code_map:
-            mapped_language = language_code_map[normalized_language]
-            return language_voice_map[mapped_language]
-        
-        # Default fallback voice - Rachel (good quality, reliable)
-        self.logger.warning(f"No specific voice mapping for language '{target_language}', using default voice Rachel")
-        return '21m00Tcm4TlvDq8ikWAM'  # Rachel - reliable default female voice
\ No newline at end of file
+        voice_id = self._VOICE_MAP.get(target_language.lower().strip())
+        if voice_id is None:
+            # Default fallback voice - Rachel (good quality, reliable)
+            self.logger.warning(f"No specific voice mapping for language '{target_language}', using default voice Rachel")
+            return self._DEFAULT_VOICE
+        return voice_id
\ No newline at end of file
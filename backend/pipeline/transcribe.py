@@ -1,33 +1,35 @@
 import os
+import asyncio
 from typing import Dict, Any
 from .base import PipelineStage, APIError
-from elevenlabs import ElevenLabs
+from .clients import get_elevenlabs_client
+from .ratelimit import elevenlabs_limiter
 
 
 class TranscribeStage(PipelineStage):
     """Transcribes audio to text using ElevenLabs Speech to Text API"""
-    
+
     def __init__(self):
         super().__init__()
         self.api_key = os.getenv("ELEVENLABS_API_KEY")
         if not self.api_key:
             raise APIError("Transcribe", "missing_api_key", "ELEVENLABS_API_KEY not found in environment")
-        
-        self.client = ElevenLabs(api_key=self.api_key)
+
+        self.client = get_elevenlabs_client()
     
     async def process(self, audio_path: str) -> Dict[str, Any]:
         """Transcribe audio file to text with language detection"""
-        self.log_stage_start("Transcribe", f"Audio file: {audio_path}")
+        self.log_stage_start("Transcribe", "Audio file: %s", audio_path)
         
         try:
-            # Use ElevenLabs speech-to-text API
-            with open(audio_path, "rb") as audio_file:
-                # Try the convert method with file parameter
-                result = self.client.speech_to_text.convert(
-                    file=audio_file,
-                    model_id="scribe_v1"
-                )
-            
+            # The batch STT endpoint consumes the whole file and returns the
+            # whole transcript - there is no per-segment stream to pipeline
+            # into translation. What we can overlap is other sessions: the
+            # blocking upload+transcribe call runs in the thread pool instead
+            # of stalling the event loop for its full duration.
+            result = await elevenlabs_limiter.run(asyncio.to_thread, self._transcribe_file, audio_path)
+
+
             # Handle the ElevenLabs response model
             if hasattr(result, 'text'):
                 transcription_text = result.text
@@ -47,7 +49,7 @@ class TranscribeStage(PipelineStage):
                 'has_multiple_speakers': False
             }
             
-            self.log_stage_complete("Transcribe", f"Text length: {len(transcription_text)}, Language: {transcription_result['detected_language']}")
+            self.log_stage_complete("Transcribe", "Text length: %d, Language: %s", len(transcription_text), transcription_result['detected_language'])
             return transcription_result
             
         except FileNotFoundError:
@@ -57,4 +59,12 @@ class TranscribeStage(PipelineStage):
             if "api" in str(e).lower() or "rate" in str(e).lower():
                 raise APIError("Transcribe", "api_error", f"ElevenLabs API error: {str(e)}")
             else:
-                raise APIError("Transcribe", "transcription_error", f"Transcription failed: {str(e)}")
\ No newline at end of file
+                raise APIError("Transcribe", "transcription_error", f"Transcription failed: {str(e)}")
+
+    def _transcribe_file(self, audio_path: str):
+        """Blocking ElevenLabs STT call (runs in a worker thread)"""
+        with open(audio_path, "rb") as audio_file:
+            return self.client.speech_to_text.convert(
+                file=audio_file,
+                model_id="scribe_v1"
+            )
\ No newline at end of file
@@ -1,20 +1,43 @@
 import os
-import asyncio
-from typing import Dict, Any
+import re
+import json
+from typing import Dict, Any, List, AsyncIterator
 import anthropic
 from .base import PipelineStage, APIError
+from .ratelimit import anthropic_limiter
+
+# Sentence boundary after terminal punctuation - compiled once; the streaming
+# path hits this on every token delta
+_SENT_BOUNDARY_RE = re.compile(r'(?<=[.!?])\s+')
 
 
 class TranslateStage(PipelineStage):
     """Translation stage using Anthropic Claude API"""
-    
+
+    # ISO-code aliases so "en" and "english" compare equal when deciding
+    # whether translation is needed at all (mirrors SynthesizeStage's map)
+    _LANG_ALIASES = {
+        'en': 'english', 'es': 'spanish', 'fr': 'french', 'de': 'german',
+        'it': 'italian', 'pt': 'portuguese', 'pl': 'polish', 'tr': 'turkish',
+        'ru': 'russian', 'nl': 'dutch', 'sv': 'swedish', 'no': 'norwegian',
+        'da': 'danish', 'fi': 'finnish', 'ja': 'japanese', 'zh': 'chinese',
+        'ko': 'korean', 'hi': 'hindi', 'ar': 'arabic'
+    }
+
+    @classmethod
+    def _normalize_language(cls, language: str) -> str:
+        normalized = language.lower().strip()
+        return cls._LANG_ALIASES.get(normalized, normalized)
+
     def __init__(self):
         super().__init__()
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
             raise APIError("Translate", "missing_api_key", "ANTHROPIC_API_KEY not found in environment")
         
-        self.client = anthropic.Anthropic(api_key=api_key)
+        # Native async client - real async I/O through httpx instead of
+        # burning a threadpool slot per call via asyncio.to_thread
+        self.client = anthropic.AsyncAnthropic(api_key=api_key)
     
     async def process(self, transcription_data: Dict, target_language: str) -> Dict[str, Any]:
         """
@@ -27,18 +50,31 @@ class TranslateStage(PipelineStage):
         Returns:
             Dict with translated_text, source_language, target_language
         """
-        self.log_stage_start("Translation", 
-                           f"Translating from {transcription_data.get('detected_language', 'unknown')} to {target_language}")
+        self.log_stage_start("Translation",
+                           "Translating from %s to %s", transcription_data.get('detected_language', 'unknown'), target_language)
         
         try:
             source_text = transcription_data['text']
             source_language = transcription_data.get('detected_language', 'unknown')
-            
+
+            # Same-language "dubs" (cleanup, voice swap) don't need Claude at
+            # all - skip the round-trip and the API cost
+            if self._normalize_language(source_language) == self._normalize_language(target_language):
+                self.log_stage_complete("Translation",
+                                      "Source already %s, skipping translation", target_language)
+                return {
+                    'translated_text': source_text,
+                    'source_language': source_language,
+                    'target_language': target_language,
+                    'original_text': source_text
+                }
+
             # Create translation prompt
             prompt = self._create_translation_prompt(source_text, target_language, source_language)
             
-            # Call Claude API
-            response = await asyncio.to_thread(
+            # Call Claude API under AIMD admission control - transient 429s
+            # pause and retry instead of failing the session
+            response = await anthropic_limiter.run(
                 self.client.messages.create,
                 model="claude-3-haiku-20240307",  # Using Haiku for speed and cost efficiency
                 max_tokens=2000,
@@ -54,8 +90,8 @@ class TranslateStage(PipelineStage):
                 'original_text': source_text
             }
             
-            self.log_stage_complete("Translation", 
-                                  f"Translated {len(source_text)} chars to {len(translated_text)} chars")
+            self.log_stage_complete("Translation",
+                                  "Translated %d chars to %d chars", len(source_text), len(translated_text))
             
             return result
             
@@ -70,6 +106,144 @@ class TranslateStage(PipelineStage):
             else:
                 raise APIError("Translate", "api_error", f"Claude API error: {str(e)}")
     
+    async def stream_process(self, transcription_data: Dict, target_language: str) -> AsyncIterator[str]:
+        """
+        Yield translated sentences as Claude streams them
+
+        Instead of blocking until the full translation is generated, this
+        consumes the streaming response and yields each sentence the moment
+        it completes, so a consumer (e.g. sentence-level TTS) can start on
+        the first sentence while the rest is still being written. Time to
+        first output drops from the full translation latency to roughly the
+        first sentence's.
+
+        Args:
+            transcription_data: Dict containing 'text' and 'detected_language'
+            target_language: Target language for translation
+        """
+        source_text = transcription_data['text']
+        source_language = transcription_data.get('detected_language', 'unknown')
+
+        # Same-language shortcut mirrors process()
+        if self._normalize_language(source_language) == self._normalize_language(target_language):
+            for sentence in _SENT_BOUNDARY_RE.split(source_text.strip()):
+                if sentence:
+                    yield sentence
+            return
+
+        prompt = self._create_translation_prompt(source_text, target_language, source_language)
+
+        try:
+            # Request admission goes through the shared limiter like every
+            # other Claude call - 429s happen at connection time, so pacing
+            # and retries apply there; once deltas are flowing, sentences
+            # have already been yielded and a mid-stream failure propagates
+            manager, stream = await anthropic_limiter.run(self._open_stream, prompt)
+            buffer = ""
+            try:
+                async for delta in stream.text_stream:
+                    buffer += delta
+                    sentence, buffer = self._pop_complete_sentence(buffer)
+                    while sentence is not None:
+                        yield sentence
+                        sentence, buffer = self._pop_complete_sentence(buffer)
+            finally:
+                await manager.__aexit__(None, None, None)
+
+            tail = buffer.strip()
+            if tail:
+                yield tail
+
+        except Exception as e:
+            self.log_error("Translation", e)
+            if "rate limit" in str(e).lower():
+                raise APIError("Translate", "rate_limit", f"Claude API rate limit exceeded: {str(e)}")
+            raise APIError("Translate", "api_error", f"Claude API error: {str(e)}")
+
+    async def _open_stream(self, prompt: str):
+        """Open a streaming translation request.
+
+        Builds a fresh stream manager per call so the limiter can retry a
+        rate-limited connection attempt cleanly. Returns (manager, stream);
+        the caller owns closing the manager.
+        """
+        manager = self.client.messages.stream(
+            model="claude-3-haiku-20240307",
+            max_tokens=2000,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        stream = await manager.__aenter__()
+        return manager, stream
+
+    @staticmethod
+    def _pop_complete_sentence(buffer: str):
+        """Split the first complete sentence off a streaming buffer.
+
+        Returns (sentence, rest) or (None, buffer) when no sentence boundary
+        has arrived yet.
+        """
+        match = _SENT_BOUNDARY_RE.search(buffer)
+        if match is None:
+            return None, buffer
+        return buffer[:match.start()].strip(), buffer[match.end():]
+
+    async def process_batch(self, texts: List[str], target_language: str, source_language: str = 'unknown') -> List[str]:
+        """
+        Translate several short texts in a single Claude call
+
+        Packs the texts as numbered lines and asks for a JSON array back,
+        amortizing one request round-trip over the whole batch - preferable
+        to per-text calls when latency per item doesn't matter (e.g. many
+        short clips queued together).
+
+        Args:
+            texts: Texts to translate, order preserved in the result
+            target_language: Target language for translation
+            source_language: Source language if known
+
+        Returns:
+            List of translated texts, same length and order as the input
+        """
+        if not texts:
+            return []
+
+        self.log_stage_start("Translation", "Batch of %d texts to %s", len(texts), target_language)
+
+        numbered = "\n".join(f"{i + 1}. {text}" for i, text in enumerate(texts))
+        prompt = (
+            f"Translate each numbered {source_language} text below to {target_language}. "
+            f"Preserve the natural speaking style and conversational tone of each. "
+            f"Return ONLY a JSON array of {len(texts)} translated strings in the same order, "
+            f"with no additional commentary.\n\n{numbered}"
+        )
+
+        try:
+            response = await anthropic_limiter.run(
+                self.client.messages.create,
+                model="claude-3-haiku-20240307",
+                max_tokens=4000,
+                messages=[{"role": "user", "content": prompt}]
+            )
+
+            raw = response.content[0].text.strip()
+            translations = json.loads(raw)
+            if not isinstance(translations, list) or len(translations) != len(texts):
+                raise APIError("Translate", "batch_parse_error",
+                               f"Expected {len(texts)} translations, got: {raw[:200]}")
+
+            self.log_stage_complete("Translation", "Batch translated %d texts", len(texts))
+            return translations
+
+        except json.JSONDecodeError as e:
+            raise APIError("Translate", "batch_parse_error", f"Claude returned non-JSON batch output: {str(e)}")
+        except APIError:
+            raise
+        except Exception as e:
+            self.log_error("Translation", e)
+            if "rate limit" in str(e).lower():
+                raise APIError("Translate", "rate_limit", f"Claude API rate limit exceeded: {str(e)}")
+            raise APIError("Translate", "api_error", f"Claude API error: {str(e)}")
+
     def _create_translation_prompt(self, text: str, target_language: str, source_language: str) -> str:
         """Create optimized translation prompt for Claude"""
         return f"""Translate this {source_language} text to {target_language}. Preserve the natural speaking style and conversational tone. Keep the translation length similar to the original. Return only the translated text with no additional commentary.
@@ -0,0 +1,104 @@
+import os
+import json
+import logging
+from typing import Any, Dict, Optional
+
+# Redis is optional - the in-memory store is used when it is not configured.
+# Set REDIS_URL (e.g. redis://localhost:6379/0) to enable multi-worker deployments.
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Sessions self-evict after 24 hours so completed/abandoned jobs don't accumulate
+SESSION_TTL_SECONDS = 24 * 60 * 60
+
+
+class MemorySessionStore:
+    """In-process session store backed by a plain dict.
+
+    Only safe for single-worker deployments - each uvicorn worker would see
+    its own copy of the sessions. Use RedisSessionStore for --workers > 1.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+
+    async def set(self, session_id: str, session: Dict[str, Any]) -> None:
+        self._sessions[session_id] = session
+
+    async def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        self._sessions.setdefault(session_id, {}).update(fields)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._sessions.get(session_id)
+
+
+class RedisSessionStore:
+    """Redis-backed session store so session state survives across workers.
+
+    Each session is a Redis hash (sess:<id>) with non-string values stored as
+    JSON. Every write refreshes a TTL so stale sessions self-evict.
+    """
+
+    def __init__(self, redis_url: str):
+        self._redis = aioredis.from_url(redis_url, decode_responses=True)
+
+    @staticmethod
+    def _key(session_id: str) -> str:
+        return f"sess:{session_id}"
+
+    @staticmethod
+    def _serialize(session: Dict[str, Any]) -> Dict[str, str]:
+        return {
+            field: value if isinstance(value, str) else json.dumps(value)
+            for field, value in session.items()
+        }
+
+    @staticmethod
+    def _deserialize(raw: Dict[str, str]) -> Dict[str, Any]:
+        session = {}
+        for field, value in raw.items():
+            try:
+                session[field] = json.loads(value)
+            except (ValueError, TypeError):
+                session[field] = value
+        return session
+
+    async def set(self, session_id: str, session: Dict[str, Any]) -> None:
+        await self._write(session_id, session)
+
+    async def update(self, session_id: str, fields: Dict[str, Any]) -> None:
+        await self._write(session_id, fields)
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = await self._redis.hgetall(self._key(session_id))
+        if not raw:
+            return None
+        return self._deserialize(raw)
+
+    async def _write(self, session_id: str, fields: Dict[str, Any]) -> None:
+        # Pipeline the HSET + EXPIRE so each stage transition is one round-trip
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.hset(self._key(session_id), mapping=self._serialize(fields))
+        pipe.expire(self._key(session_id), SESSION_TTL_SECONDS)
+        await pipe.execute()
+
+
+def create_session_store():
+    """Create the session store configured for this deployment.
+
+    Uses Redis when REDIS_URL is set (required for multi-worker uvicorn),
+    otherwise falls back to the single-process in-memory store.
+    """
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        if aioredis is None:
+            raise RuntimeError("REDIS_URL is set but the 'redis' package is not installed")
+        logger.info(f"Using Redis session store at {redis_url}")
+        return RedisSessionStore(redis_url)
+
+    logger.info("REDIS_URL not set, using in-memory session store (single worker only)")
+    return MemorySessionStore()
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+import pytest
+from dotenv import load_dotenv
+from pipeline.synthesize import SynthesizeStage
+from pipeline.translate import TranslateStage
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _env():
+    """Load API keys from the project .env once per session.
+
+    Anchored on __file__ rather than cwd, so the resolution is the same
+    no matter where pytest (or an xdist worker) was launched from.
+    """
+    load_dotenv(Path(__file__).parent.parent.parent / '.env', override=False)
+
+
+# Stage construction isn't free - client setup, env parsing - so one
+# warm instance serves the whole run instead of being rebuilt per test.
+# The ElevenLabs client is a module-level singleton shared beyond these
+# tests, so it is left open; the Anthropic client belongs to the stage
+# and is closed when the session ends.
+
+@pytest.fixture(scope="session")
+def outputs_root(tmp_path_factory):
+    """Per-session root for everything the synthesize stage writes.
+
+    Keeps parallel workers out of each other's way and out of the real
+    outputs/ tree - no cross-test rmdir coupling.
+    """
+    return tmp_path_factory.mktemp("outputs")
+
+
+@pytest.fixture(scope="session")
+def synthesize_stage(outputs_root):
+    """Create a SynthesizeStage instance for testing"""
+    return SynthesizeStage(output_root=outputs_root)
+
+
+@pytest.fixture(scope="session")
+async def translate_stage():
+    """Create a TranslateStage instance for testing"""
+    stage = TranslateStage()
+    yield stage
+    await stage.client.close()
@@ -0,0 +1,260 @@
+import json
+
+import pytest
+import httpx
+import anthropic
+
+from pipeline.transcribe import TranscribeStage
+from pipeline.base import APIError
+from pipeline.ratelimit import anthropic_limiter
+
+# The anthropic SDK (>=1.x) sends requests over a vendored httpx fork, so
+# respx's global httpx patching never intercepts it - Anthropic calls are
+# mocked by injecting a MockTransport-backed client into the stage instead.
+# The ElevenLabs SDK uses public httpx, so respx works there.
+try:
+    import httpx2 as anthropic_httpx
+except ImportError:  # older SDKs transport over public httpx
+    anthropic_httpx = httpx
+
+
+def anthropic_message(text: str) -> dict:
+    """Canned Anthropic messages response with the given completion text"""
+    return {
+        "id": "msg_test",
+        "type": "message",
+        "role": "assistant",
+        "model": "claude-3-haiku-20240307",
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {"input_tokens": 10, "output_tokens": 10},
+    }
+
+
+ANTHROPIC_MESSAGE = anthropic_message("Hola mundo de prueba.")
+
+
+def anthropic_sse_stream(*delta_texts: str) -> bytes:
+    """Canned SSE body for a streamed Anthropic completion.
+
+    Emits the event sequence the SDK expects, with one text_delta per
+    argument, so tests control exactly how the text is chunked.
+    """
+    def event(name, payload):
+        return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+    body = event("message_start", {
+        "type": "message_start",
+        "message": {
+            "id": "msg_stream_test", "type": "message", "role": "assistant",
+            "model": "claude-3-haiku-20240307", "content": [],
+            "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": 10, "output_tokens": 1},
+        },
+    })
+    body += event("content_block_start", {
+        "type": "content_block_start", "index": 0,
+        "content_block": {"type": "text", "text": ""},
+    })
+    for text in delta_texts:
+        body += event("content_block_delta", {
+            "type": "content_block_delta", "index": 0,
+            "delta": {"type": "text_delta", "text": text},
+        })
+    body += event("content_block_stop", {"type": "content_block_stop", "index": 0})
+    body += event("message_delta", {
+        "type": "message_delta",
+        "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+        "usage": {"output_tokens": 5},
+    })
+    body += event("message_stop", {"type": "message_stop"})
+    return body.encode()
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limiter():
+    """Keep the shared limiter's backoff from leaking between tests"""
+    yield
+    anthropic_limiter._interval = 0.0
+    anthropic_limiter._next_slot = 0.0
+
+
+@pytest.fixture
+def anthropic_playback(translate_stage):
+    """Swap the stage's Anthropic client for one backed by a mock transport.
+
+    Returns an installer: call it with a responder (request -> Response
+    built with anthropic_httpx) and it returns the list of intercepted
+    requests. The real client is restored afterwards.
+    """
+    original_client = translate_stage.client
+
+    def install(responder):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            return responder(request)
+
+        translate_stage.client = anthropic.AsyncAnthropic(
+            api_key="test",
+            http_client=anthropic_httpx.AsyncClient(
+                transport=anthropic_httpx.MockTransport(handler)
+            ),
+        )
+        return calls
+
+    yield install
+    translate_stage.client = original_client
+
+
+class TestTranslateStageHTTP:
+
+    async def test_translation_through_http_layer(self, translate_stage, anthropic_playback):
+        """The full translate path runs against a mocked Anthropic endpoint"""
+        calls = anthropic_playback(
+            lambda request: anthropic_httpx.Response(200, json=ANTHROPIC_MESSAGE)
+        )
+
+        result = await translate_stage.process(
+            {'text': 'Hello test world.', 'detected_language': 'english'},
+            'spanish'
+        )
+
+        assert calls
+        assert result['translated_text'] == "Hola mundo de prueba."
+        assert result['source_language'] == 'english'
+        assert result['target_language'] == 'spanish'
+
+    async def test_same_language_skips_http(self, translate_stage, anthropic_playback):
+        """The same-language shortcut must never reach the network"""
+        calls = anthropic_playback(
+            lambda request: anthropic_httpx.Response(200, json=ANTHROPIC_MESSAGE)
+        )
+
+        result = await translate_stage.process(
+            {'text': 'Already spanish.', 'detected_language': 'es'},
+            'spanish'
+        )
+
+        assert not calls
+        assert result['translated_text'] == 'Already spanish.'
+
+    async def test_persistent_rate_limit_maps_to_api_error(self, translate_stage, anthropic_playback):
+        """429s beyond the limiter's retries surface as a rate_limit APIError"""
+        anthropic_playback(
+            lambda request: anthropic_httpx.Response(429, json={
+                "type": "error",
+                "error": {"type": "rate_limit_error", "message": "rate limit exceeded"}
+            })
+        )
+
+        with pytest.raises(APIError) as exc_info:
+            await translate_stage.process(
+                {'text': 'Hello.', 'detected_language': 'english'}, 'spanish'
+            )
+
+        assert exc_info.value.error_type == "rate_limit"
+
+    async def test_batch_translation_through_http_layer(self, translate_stage, anthropic_playback):
+        """process_batch parses a JSON-array completion in input order"""
+        calls = anthropic_playback(
+            lambda request: anthropic_httpx.Response(200, json=anthropic_message(
+                '["Hola mundo.", "Adiós mundo."]'
+            ))
+        )
+
+        translations = await translate_stage.process_batch(
+            ['Hello world.', 'Goodbye world.'], 'spanish', 'english'
+        )
+
+        assert calls
+        assert translations == ["Hola mundo.", "Adiós mundo."]
+
+    async def test_batch_non_json_output_maps_to_parse_error(self, translate_stage, anthropic_playback):
+        """A chatty non-JSON completion surfaces as batch_parse_error"""
+        anthropic_playback(
+            lambda request: anthropic_httpx.Response(200, json=anthropic_message(
+                "Sure! Here are the translations: Hola mundo."
+            ))
+        )
+
+        with pytest.raises(APIError) as exc_info:
+            await translate_stage.process_batch(['Hello world.'], 'spanish')
+
+        assert exc_info.value.error_type == "batch_parse_error"
+
+    async def test_batch_short_array_maps_to_parse_error(self, translate_stage, anthropic_playback):
+        """A JSON array with the wrong length surfaces as batch_parse_error"""
+        anthropic_playback(
+            lambda request: anthropic_httpx.Response(200, json=anthropic_message('["Hola mundo."]'))
+        )
+
+        with pytest.raises(APIError) as exc_info:
+            await translate_stage.process_batch(
+                ['Hello world.', 'Goodbye world.'], 'spanish'
+            )
+
+        assert exc_info.value.error_type == "batch_parse_error"
+
+    async def test_stream_process_yields_sentences(self, translate_stage, anthropic_playback):
+        """stream_process yields each sentence as it completes, then the tail.
+
+        The deltas deliberately split mid-sentence so the buffering loop has
+        to stitch across chunks before finding a boundary.
+        """
+        calls = anthropic_playback(
+            lambda request: anthropic_httpx.Response(
+                200,
+                headers={"content-type": "text/event-stream"},
+                content=anthropic_sse_stream(
+                    "Hola mundo. Esto",
+                    " es una prueba. Y la cola final",
+                ),
+            )
+        )
+
+        sentences = [
+            s async for s in translate_stage.stream_process(
+                {'text': 'Hello world. This is a test. And the final tail',
+                 'detected_language': 'english'},
+                'spanish'
+            )
+        ]
+
+        assert calls
+        assert sentences == ["Hola mundo.", "Esto es una prueba.", "Y la cola final"]
+
+
+class TestTranscribeStageHTTP:
+
+    @pytest.fixture
+    def transcribe_stage(self):
+        return TranscribeStage()
+
+    @pytest.fixture
+    def elevenlabs_mock(self):
+        """respx router for the ElevenLabs API (skips where respx is absent)"""
+        respx = pytest.importorskip("respx")
+        with respx.mock(assert_all_called=False) as mock:
+            yield mock
+
+    async def test_transcription_through_http_layer(self, transcribe_stage, elevenlabs_mock, tmp_path):
+        """The full transcribe path runs against a mocked ElevenLabs endpoint"""
+        audio_path = tmp_path / "audio.flac"
+        audio_path.write_bytes(b"fake flac bytes")
+
+        route = elevenlabs_mock.post("https://api.elevenlabs.io/v1/speech-to-text").mock(
+            return_value=httpx.Response(200, json={
+                "language_code": "en",
+                "language_probability": 0.99,
+                "text": "Hello test world.",
+                "words": []
+            })
+        )
+
+        result = await transcribe_stage.process(str(audio_path))
+
+        assert route.called
+        assert result['text'] == "Hello test world."
@@ -2,41 +2,56 @@ import pytest
 import os
 import tempfile
 import shutil
-from dotenv import load_dotenv
 from pipeline.overlay import OverlayStage
 from pipeline.base import PipelineError, FileError
 
-# Load environment variables for tests
-load_dotenv('../.env')
+# Golden media recorded by a previous pipeline run, copied once per test
+# session into a pytest-managed temp dir (see media_assets below)
+GOLDEN_VIDEO = "outputs/sessions/1756145058/original_video.mp4"
+GOLDEN_AUDIO = "outputs/sessions/1756145058/dubbed_audio.mp3"
+
+
+@pytest.fixture(scope="session")
+def media_assets(tmp_path_factory):
+    """Copy the golden media into a session-scoped temp dir once.
+
+    Tests read from the copies, so parallel runs can't trample the golden
+    files, and pytest's tmp finalizer owns the cleanup.
+    """
+    if not (os.path.exists(GOLDEN_VIDEO) and os.path.exists(GOLDEN_AUDIO)):
+        pytest.skip(f"Golden media files not found: {GOLDEN_VIDEO}, {GOLDEN_AUDIO}")
+
+    assets_dir = tmp_path_factory.mktemp("dub_assets")
+    return {
+        'video': shutil.copy(GOLDEN_VIDEO, assets_dir / "original_video.mp4"),
+        'audio': shutil.copy(GOLDEN_AUDIO, assets_dir / "dubbed_audio.mp3"),
+    }
 
 
 class TestOverlayStage:
-    
+
     @pytest.fixture
-    def overlay_stage(self):
-        """Create an OverlayStage instance for testing"""
-        return OverlayStage()
-    
+    def overlay_stage(self, outputs_root):
+        """Create an OverlayStage instance writing into the per-run temp root"""
+        return OverlayStage(output_root=outputs_root)
+
     @pytest.fixture
-    def test_video_path(self):
-        """Use existing test video file from previous sessions"""
-        video_path = "outputs/sessions/1756145058/original_video.mp4"
-        
-        if not os.path.exists(video_path):
-            pytest.skip(f"Test video file not found: {video_path}")
-        
-        return video_path
-    
+    def test_video_path(self, media_assets):
+        """Session-scoped copy of the golden test video"""
+        return media_assets['video']
+
     @pytest.fixture
-    def test_audio_path(self):
-        """Use existing test audio file from previous sessions"""
-        audio_path = "outputs/sessions/1756145058/dubbed_audio.mp3"
-        
-        if not os.path.exists(audio_path):
-            pytest.skip(f"Test audio file not found: {audio_path}")
-        
-        return audio_path
-    
+    def test_audio_path(self, media_assets):
+        """Session-scoped copy of the golden test audio"""
+        return media_assets['audio']
+
+    @pytest.fixture
+    def session_output_cleanup(self, outputs_root):
+        """Remove session dirs the overlay stage writes during a test"""
+        yield
+        for session in ("test_overlay_session", "unknown"):
+            shutil.rmtree(os.path.join(outputs_root, "sessions", session), ignore_errors=True)
+
     @pytest.fixture
     def sample_assembly_data(self, test_video_path, test_audio_path):
         """Sample assembly data for testing"""
@@ -47,7 +62,7 @@ class TestOverlayStage:
         }
     
     @pytest.mark.asyncio
-    async def test_successful_overlay(self, overlay_stage, sample_assembly_data):
+    async def test_successful_overlay(self, overlay_stage, sample_assembly_data, session_output_cleanup):
         """Test successful video overlay operation"""
         result = await overlay_stage.process(sample_assembly_data)
         
@@ -75,17 +90,7 @@ class TestOverlayStage:
         print(f"Created final video: {output_path}")
         print(f"File size: {result['file_size_bytes']:,} bytes")
         print(f"Duration: {result['duration_seconds']:.1f} seconds")
-        
-        # Cleanup
-        try:
-            os.remove(output_path)
-            session_dir = "outputs/sessions/test_overlay_session"
-            if os.path.exists(session_dir):
-                os.rmdir(session_dir)
-                os.rmdir("outputs/sessions")
-        except:
-            pass
-    
+
     @pytest.mark.asyncio
     async def test_missing_video_file(self, overlay_stage):
         """Test handling of missing video file"""
@@ -144,10 +149,10 @@ class TestOverlayStage:
         assert exc_info.value.error_type == "missing_input"
     
     @pytest.mark.asyncio
-    async def test_session_directory_creation(self, overlay_stage, sample_assembly_data):
+    async def test_session_directory_creation(self, overlay_stage, outputs_root, sample_assembly_data, session_output_cleanup):
         """Test that session directory is created if it doesn't exist"""
         # Ensure session directory doesn't exist
-        session_dir = "outputs/sessions/test_overlay_session"
+        session_dir = os.path.join(outputs_root, "sessions", "test_overlay_session")
         if os.path.exists(session_dir):
             shutil.rmtree(session_dir, ignore_errors=True)
         
@@ -156,15 +161,7 @@ class TestOverlayStage:
         # Session directory should be created
         assert os.path.exists(session_dir)
         assert os.path.exists(result['final_video_path'])
-        
-        # Cleanup
-        try:
-            os.remove(result['final_video_path'])
-            os.rmdir(session_dir)
-            os.rmdir("outputs/sessions")
-        except:
-            pass
-    
+
     def test_validate_inputs(self, overlay_stage, test_video_path, test_audio_path):
         """Test input validation method"""
         # Valid inputs should pass
@@ -198,7 +195,7 @@ class TestOverlayStage:
         assert duration == 0.0
     
     @pytest.mark.asyncio
-    async def test_default_session_id(self, overlay_stage, test_video_path, test_audio_path):
+    async def test_default_session_id(self, overlay_stage, test_video_path, test_audio_path, session_output_cleanup):
         """Test behavior with missing session_id"""
         assembly_data = {
             'video_path': test_video_path,
@@ -211,17 +208,7 @@ class TestOverlayStage:
         # Should use 'unknown' as default session_id
         assert result['session_id'] == 'unknown'
         assert 'sessions/unknown' in result['final_video_path']
-        
-        # Cleanup
-        try:
-            os.remove(result['final_video_path'])
-            session_dir = "outputs/sessions/unknown"
-            if os.path.exists(session_dir):
-                os.rmdir(session_dir)
-                os.rmdir("outputs/sessions")
-        except:
-            pass
-    
+
     @pytest.mark.asyncio
     async def test_ffmpeg_availability(self):
         """Test that ffmpeg is available for overlay operations"""
@@ -238,7 +225,7 @@ class TestOverlayStage:
         print(f"ffprobe found at: {ffprobe_path}")
     
     @pytest.mark.asyncio
-    async def test_output_file_overwrite(self, overlay_stage, sample_assembly_data):
+    async def test_output_file_overwrite(self, overlay_stage, sample_assembly_data, session_output_cleanup):
         """Test that existing output files are overwritten"""
         # Run overlay once
         result1 = await overlay_stage.process(sample_assembly_data)
@@ -250,14 +237,4 @@ class TestOverlayStage:
         
         # Should be same path but potentially different content
         assert result2['final_video_path'] == output_path
-        assert os.path.exists(output_path)
-        
-        # Cleanup
-        try:
-            os.remove(output_path)
-            session_dir = "outputs/sessions/test_overlay_session"
-            if os.path.exists(session_dir):
-                os.rmdir(session_dir)
-                os.rmdir("outputs/sessions")
-        except:
-            pass
\ No newline at end of file
+        assert os.path.exists(output_path)
\ No newline at end of file
@@ -2,13 +2,9 @@ import pytest
 import os
 import tempfile
 from unittest.mock import Mock, patch, AsyncMock
-from dotenv import load_dotenv
 from backend.pipeline.dubbing import DubbingPipeline
 from backend.pipeline.base import PipelineError
 
-# Load environment variables from .env file
-load_dotenv('../.env')
-
 
 class TestDubbingPipeline:
     
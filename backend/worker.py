@@ -0,0 +1,249 @@
+import os
+import asyncio
+import logging
+from collections import OrderedDict
+from dotenv import load_dotenv
+from pipeline.dubbing import DubbingPipeline
+from pipeline.base import PipelineError
+from session_store import create_session_store
+
+# API keys must be in the environment before the pipeline below is
+# constructed. This module is imported ahead of main.py's load_dotenv(),
+# and it is also the Celery entry point (celery -A worker worker), which
+# never passes through main.py at all.
+load_dotenv()
+
+# Celery is optional - set CELERY_BROKER_URL (and REDIS_URL so HTTP workers can
+# read progress) to run jobs in a separate worker pool:
+#   celery -A worker worker --concurrency=N
+# Without it, jobs fall back to FastAPI BackgroundTasks in the uvicorn process.
+try:
+    from celery import Celery
+except ImportError:
+    Celery = None
+
+logger = logging.getLogger(__name__)
+
+# Shared by the HTTP app and the worker pool (state only actually shared when
+# the store is Redis-backed)
+pipeline = DubbingPipeline()
+session_store = create_session_store()
+
+
+class ResultCache:
+    """Small LRU mapping (youtube_url, target_language, video_duration) to the
+    session_id of a completed run, so identical requests skip the pipeline.
+
+    Per-process only - with a Celery worker pool each process keeps its own
+    cache, which just means occasional redundant runs rather than wrong
+    results (hits are re-validated against the session store before reuse).
+    """
+
+    def __init__(self, maxsize: int = 32):
+        self._entries: OrderedDict = OrderedDict()
+        self._maxsize = maxsize
+
+    def get(self, youtube_url: str, target_language: str, video_duration: str):
+        key = (youtube_url, target_language, video_duration)
+        session_id = self._entries.get(key)
+        if session_id is not None:
+            self._entries.move_to_end(key)
+        return session_id
+
+    def put(self, youtube_url: str, target_language: str, video_duration: str, session_id: str):
+        key = (youtube_url, target_language, video_duration)
+        self._entries[key] = session_id
+        self._entries.move_to_end(key)
+        if len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+
+result_cache = ResultCache()
+
+# Admission control for background jobs: at most MAX_CONCURRENT_JOBS pipelines
+# run at once (each holds a video + audio working set in page cache and spawns
+# yt-dlp/ffmpeg children), and at most MAX_QUEUED_JOBS may be waiting before
+# new submissions are refused outright.
+MAX_CONCURRENT_JOBS = int(os.getenv("MAX_CONCURRENT_JOBS", "2"))
+MAX_QUEUED_JOBS = int(os.getenv("MAX_QUEUED_JOBS", str(MAX_CONCURRENT_JOBS * 4)))
+
+_job_semaphore = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+_active_jobs = 0
+
+
+def _reserve_job_slot():
+    global _active_jobs
+    _active_jobs += 1
+
+
+def release_job_slot():
+    global _active_jobs
+    _active_jobs -= 1
+
+
+def try_reserve_job_slot() -> bool:
+    """Atomically claim an admission slot for a new background job.
+
+    Must be called in the request handler before the job is scheduled - a
+    count maintained inside the task only moves after the HTTP response is
+    sent, so simultaneous requests would all see spare capacity and the
+    queue cap would never bite. Single-threaded under asyncio, so
+    check-then-increment here is race-free.
+    """
+    if _active_jobs >= MAX_CONCURRENT_JOBS + MAX_QUEUED_JOBS:
+        return False
+    _reserve_job_slot()
+    return True
+
+
+async def process_video_background(session_id: str, youtube_url: str, target_language: str, video_duration: str = "full"):
+    """Run one dubbing job under the concurrency cap.
+
+    The caller reserves the admission slot before scheduling this coroutine;
+    it is released here once the job finishes either way.
+    """
+    try:
+        async with _job_semaphore:
+            await _run_dubbing_job(session_id, youtube_url, target_language, video_duration)
+    finally:
+        release_job_slot()
+
+
+async def _run_dubbing_job(session_id: str, youtube_url: str, target_language: str, video_duration: str = "full"):
+    """Background task to process video with stage-by-stage status updates"""
+    try:
+        logger.info(f"Background processing started for session {session_id}")
+        results = {}
+
+        # Progress is written once per stage transition with all changed
+        # fields batched into a single store update (one pipelined round-trip
+        # on Redis) - don't split these into per-key writes
+
+        # Stage 1: Download
+        await session_store.update(session_id, {
+            "status": "processing",
+            "current_stage": "download",
+            "progress": 15
+        })
+
+        logger.info(f"Session {session_id}: Starting download stage")
+        download_result = await pipeline.download_stage.process(youtube_url, video_duration, session_id)
+        results['download'] = download_result
+
+        # Stage 2: Transcribe
+        await session_store.update(session_id, {
+            "current_stage": "transcribe",
+            "progress": 35
+        })
+
+        logger.info(f"Session {session_id}: Starting transcribe stage")
+        transcribe_result = await pipeline.transcribe_stage.process(download_result['audio_path'])
+        results['transcribe'] = transcribe_result
+
+        # Stage 3: Translate
+        await session_store.update(session_id, {
+            "current_stage": "translate",
+            "progress": 55,
+            "source_language": transcribe_result.get('detected_language', 'unknown')
+        })
+
+        logger.info(f"Session {session_id}: Starting translate stage")
+        translate_result = await pipeline.translate_stage.process(transcribe_result, target_language)
+        results['translate'] = translate_result
+
+        # Stage 4: Synthesize
+        await session_store.update(session_id, {
+            "current_stage": "synthesize",
+            "progress": 75
+        })
+
+        logger.info(f"Session {session_id}: Starting synthesize stage")
+        synthesize_result = await pipeline.synthesize_stage.process(translate_result, download_result)
+        results['synthesize'] = synthesize_result
+
+        # Stage 5: Overlay
+        await session_store.update(session_id, {
+            "current_stage": "overlay",
+            "progress": 90
+        })
+
+        logger.info(f"Session {session_id}: Starting overlay stage")
+        assembly_data = {
+            'video_path': download_result['video_path'],
+            'dubbed_audio_path': synthesize_result['synthesized_audio_path'],
+            'session_id': session_id
+        }
+        overlay_result = await pipeline.overlay_stage.process(assembly_data)
+        results['overlay'] = overlay_result
+
+        # Final completion
+        await session_store.update(session_id, {
+            "status": "completed",
+            "current_stage": "completed",
+            "progress": 100,
+            "results": results,
+            "source_language": transcribe_result.get('detected_language', 'unknown'),
+            "target_language": target_language,
+            "duration": download_result.get('duration')
+        })
+
+        result_cache.put(youtube_url, target_language, video_duration, session_id)
+        logger.info(f"Background processing completed for session {session_id}")
+
+    except PipelineError as e:
+        logger.error(f"Pipeline error in background task: {str(e)}")
+        await session_store.update(session_id, {
+            "status": "error",
+            "error": f"{e.stage}: {e.message}",
+            "retry_possible": e.retry_possible
+        })
+    except Exception as e:
+        logger.error(f"Unexpected error in background task: {str(e)}")
+        await session_store.update(session_id, {
+            "status": "error",
+            "error": str(e),
+            "retry_possible": True
+        })
+
+
+# Celery task wrapper - only registered when a broker is configured
+celery_app = None
+process_video_task = None
+
+_worker_loop = None
+
+
+def _get_worker_loop() -> asyncio.AbstractEventLoop:
+    """One persistent event loop per worker process.
+
+    asyncio.run() per task would close the loop between tasks while the
+    process-level resources (Redis connection pool, Anthropic client, the
+    job semaphore) stay bound to the first loop they ran on - the second
+    task in a process would then fail or hang mid-pipeline, leaving the
+    session stuck in "processing".
+    """
+    global _worker_loop
+    if _worker_loop is None or _worker_loop.is_closed():
+        _worker_loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_worker_loop)
+    return _worker_loop
+
+
+if Celery is not None and os.getenv("CELERY_BROKER_URL"):
+    celery_app = Celery(
+        "dubadubdub",
+        broker=os.environ["CELERY_BROKER_URL"],
+        backend=os.getenv("CELERY_RESULT_BACKEND", os.environ["CELERY_BROKER_URL"])
+    )
+
+    @celery_app.task(name="process_video")
+    def process_video_task(session_id: str, youtube_url: str, target_language: str, video_duration: str = "full"):
+        """Run the dubbing pipeline for one session inside a Celery worker"""
+        # Admission in this path is governed by the broker and worker
+        # concurrency, not the HTTP-side cap - take the slot unconditionally
+        # so the release in process_video_background stays balanced
+        _reserve_job_slot()
+        loop = _get_worker_loop()
+        loop.run_until_complete(
+            process_video_background(session_id, youtube_url, target_language, video_duration)
+        )